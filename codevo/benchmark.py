@@ -0,0 +1,213 @@
+"""
+Benchmarks of the hot paths of the simulator and of end-to-end runs.
+
+Every benchmark uses fixed seeds, so runs on the same machine are comparable.
+Results are written as JSON; pass --compare with an earlier result file to
+report benchmarks that got slower by more than --tolerance.
+
+    python3 codevo/benchmark.py -o bench.json
+    python3 codevo/benchmark.py --sizes 1000 10000 --compare bench.json
+"""
+import os
+import sys
+import json
+import random
+import platform
+from time import perf_counter
+from types import SimpleNamespace
+from tempfile import TemporaryDirectory
+from argparse import ArgumentParser
+
+from plyj.model import ClassDeclaration, MethodDeclaration
+
+from codebase import Codebase
+from java_printer import JavaPrinter, NullWriter
+from simulate import simulate
+from team import Memory
+from utils import RandomStreams, gc_paused
+
+SEED = 1
+# calls of each operation measured by the micro-benchmarks
+OPERATION_CALLS = 2000
+# (simulation time, parameters) of the end-to-end benchmarks; a short recruit time makes a larger team
+END_TO_END = [(5000, {}), (20000, {}), (50000, {}), (20000, {'recruit_time': 5})]
+
+
+def synthetic_codebase(num_methods, seed=SEED, methods_per_class=10, calls_per_method=3):
+    """
+    Build a codebase of num_methods methods with random statements and calls
+    """
+    streams = RandomStreams(seed)
+    rng = random.Random(seed)
+    codebase = Codebase(initial_classes=[ClassDeclaration('App', [MethodDeclaration('run', body=[])])],
+                        rng=streams.codebase)
+    class_names = ['App']
+    method_names = ['run']
+    while len(method_names) < num_methods:
+        if len(method_names) >= len(class_names) * methods_per_class:
+            class_names.append(codebase.create_class(rng.choice(class_names) if rng.random() < 0.3 else None)[1])
+        method_names.append(codebase.create_method(rng.choice(class_names))[1])
+    for method_name in method_names:
+        for _ in range(rng.randrange(4)):
+            codebase.add_statement(method_name)
+        for _ in range(calls_per_method):
+            codebase.add_method_call(method_name, rng.choice(method_names))
+    return codebase
+
+
+def _result(benchmark, case, total_time, calls, **info):
+    """
+    :param case: dict of the benchmark settings, which together with its name identifies a result
+    """
+    result = {'benchmark': benchmark, 'case': case, 'calls': calls, 'total_time': total_time,
+              'mean_us': total_time / calls * 1e6 if calls else 0.0,
+              'per_second': calls / total_time if total_time else 0.0}
+    result.update(info)
+    return result
+
+
+def bench_codebase_operations(num_methods, calls=OPERATION_CALLS):
+    codebase = synthetic_codebase(num_methods)
+    # operation, and a function choosing its operands, which isn't timed
+    operations = [
+        ('add_statement', lambda: (codebase.choose_random_method(),)),
+        ('add_method_call', lambda: (codebase.choose_random_method(), codebase.choose_random_method())),
+        ('add_parameter', lambda: (codebase.choose_random_method(),)),
+        ('move_method', lambda: (codebase.choose_random_method(), codebase.choose_random_class())),
+        ('rename_method', lambda: (codebase.choose_random_method(),)),
+        ('choose_random_method', lambda: ()),
+        ('least_fit_methods', lambda: (2,)),
+        ('delete_method', lambda: (codebase.least_fit_methods()[0],)),
+    ]
+    results = []
+    for name, operands in operations:
+        operation = getattr(codebase, name)
+        # keep at least half of the methods
+        num_calls = min(calls, num_methods // 2) if name == 'delete_method' else calls
+        total_time = 0.0
+        # like timeit, keep garbage collections out of the timings
+        with gc_paused():
+            for _ in range(num_calls):
+                args = operands()
+                start = perf_counter()
+                operation(*args)
+                total_time += perf_counter() - start
+        results.append(_result('codebase.' + name, {'methods': num_methods}, total_time, num_calls))
+    return results
+
+
+def bench_memory_occur(size, calls=OPERATION_CALLS * 10):
+    rng = random.Random(SEED)
+    env = SimpleNamespace(now=0)
+    memory = Memory(env, rng=RandomStreams(SEED).developer())
+    for i in range(size):
+        env.now = i
+        for _ in range(1 + int(rng.paretovariate(1.5))):
+            memory.add('method%d' % i)
+    with gc_paused():
+        start = perf_counter()
+        for _ in range(calls):
+            memory.occur()
+        total_time = perf_counter() - start
+    return _result('memory.occur', {'memory_size': size}, total_time, calls)
+
+
+def bench_java_printer(num_methods, statements_per_method=5):
+    codebase = Codebase(initial_classes=[ClassDeclaration('App', [])], rng=RandomStreams(SEED).codebase)
+    method_names = [codebase.create_method('App')[1] for _ in range(num_methods)]
+    for method_name in method_names:
+        for _ in range(statements_per_method):
+            codebase.add_statement(method_name)
+        codebase.add_method_call(method_name, method_names[0])
+    klass = codebase.class_declaration('App')
+    results = []
+    for name, printer in [('java_printer.result', JavaPrinter), ('java_printer.null', lambda: JavaPrinter(NullWriter()))]:
+        start = perf_counter()
+        java_printer = printer()
+        klass.accept(java_printer)
+        results.append(_result(name, {'methods': num_methods}, perf_counter() - start, 1, lines=java_printer.lines))
+    return results
+
+
+def bench_save(num_methods):
+    codebase = synthetic_codebase(num_methods)
+    results = []
+    for save_src in [False, True]:
+        with TemporaryDirectory() as output_dir:
+            os.makedirs(os.path.join(output_dir, 'src'))
+            start = perf_counter()
+            codebase.save(output_dir, save_src)
+            results.append(_result('codebase.save' + ('_src' if save_src else ''), {'methods': num_methods},
+                                   perf_counter() - start, 1))
+    return results
+
+
+def bench_end_to_end(until, parameters):
+    with TemporaryDirectory() as output_dir:
+        summary = simulate(output_dir, until, SEED, parameters=parameters)
+    # calls are simulated time units
+    result = _result('simulate', {'until': until, 'parameters': parameters}, summary['wall_time'], until,
+                     developers=summary['developers'], methods=summary['methods'], commits=summary['commits'])
+    result['commits_per_second'] = summary['commits'] / summary['wall_time']
+    return result
+
+
+def run_benchmarks(sizes, end_to_end=END_TO_END):
+    results = []
+    for size in sizes:
+        results.extend(bench_codebase_operations(size))
+        results.append(bench_memory_occur(size))
+        results.extend(bench_java_printer(size))
+        results.extend(bench_save(size))
+    for until, parameters in end_to_end:
+        results.append(bench_end_to_end(until, parameters))
+    return results
+
+
+def _key(result):
+    """
+    :return: what identifies a benchmark across result files
+    """
+    return '%s %s' % (result['benchmark'], json.dumps(result['case'], sort_keys=True))
+
+
+def compare(baseline, results, tolerance):
+    """
+    :return: (key, baseline mean, new mean) of the benchmarks that got slower by more than tolerance
+    """
+    baseline_means = {_key(r): r['mean_us'] for r in baseline}
+    regressions = []
+    for result in results:
+        key = _key(result)
+        if key in baseline_means and result['mean_us'] > baseline_means[key] * (1 + tolerance):
+            regressions.append((key, baseline_means[key], result['mean_us']))
+    return regressions
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser(description='Benchmark the simulator')
+    arg_parser.add_argument('-o', dest='output', type=str, default='benchmark.json', help='output JSON file')
+    arg_parser.add_argument('--sizes', dest='sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='numbers of methods of the synthetic codebases')
+    arg_parser.add_argument('--no-end-to-end', dest='end_to_end', action='store_false',
+                            help='skip the end-to-end simulations')
+    arg_parser.add_argument('--compare', dest='compare', type=str, default=None,
+                            help='earlier result file to check for regressions')
+    arg_parser.add_argument('--tolerance', dest='tolerance', type=float, default=0.2,
+                            help='relative slowdown reported as a regression')
+    options = arg_parser.parse_args(sys.argv[1:])
+    results = run_benchmarks(options.sizes, END_TO_END if options.end_to_end else [])
+    for result in results:
+        print('%-60s %14.2f us' % (_key(result), result['mean_us']))
+    with open(options.output, 'w') as output_file:
+        json.dump({'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'seed': SEED,
+                   'results': results}, output_file, indent=2)
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file)['results'], results, options.tolerance)
+        for key, before, after in regressions:
+            print('Regression: %s %.2f us -> %.2f us' % (key, before, after))
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,57 @@
+"""
+Save the state of a running simulation and continue it later.
+
+A checkpoint holds the codebase, the manager with its developers, the state of
+the random number generator, the position of the commit log, and the time left
+on each pending action, so a resumed run produces the same results as an
+uninterrupted one.
+"""
+import os
+import pickle
+import random
+import simpy
+
+
+def save_checkpoint(file_name, env, manager, commit_log, seed=None, snapshot_log=None, event_log=None):
+    """
+    Write a checkpoint. Must be called between calls to env.run, when every
+    process is waiting for its timeout.
+    """
+    # wake up times of scheduled events, in the order simpy processes them
+    queue = {event: (time, eid) for time, _, eid, event in env._queue}
+    owners = [manager] + manager.developers
+    pending = sorted(((queue[owner._process.target], owner) for owner in owners), key=lambda p: p[0])
+    state = {'time': env.now,
+             'seed': seed,
+             'random_state': random.getstate(),
+             'manager': manager,
+             'commit_log': commit_log.checkpoint(),
+             'snapshot_log': snapshot_log.checkpoint() if snapshot_log else None,
+             'event_log': event_log.checkpoint() if event_log else None,
+             'pending': [(time, owner) for (time, _), owner in pending]}
+    # write to a temporary file first, so an interrupted save keeps the previous checkpoint
+    temp_file_name = file_name + '.tmp'
+    with open(temp_file_name, 'wb') as f:
+        pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file_name, file_name)
+
+
+def load_checkpoint(file_name):
+    with open(file_name, 'rb') as f:
+        return pickle.load(f)
+
+
+def restore(state, commit_log, event_log=None):
+    """
+    Restart the simulation saved in state
+    :param commit_log: CommitLog continuing from state['commit_log']
+    :param event_log: EventLog continuing from state['event_log'], or None to stop recording events
+    :return: a new environment, ready to run from the checkpoint time
+    """
+    env = simpy.Environment(initial_time=state['time'])
+    random.setstate(state['random_state'])
+    state['manager'].codebase.set_commit_log(commit_log)
+    state['manager'].set_event_log(event_log)
+    for time, owner in state['pending']:
+        owner.resume(env, time - env.now)
+    return env
@@ -1,45 +1,431 @@
+import os
+import re
+import logging
 from os import path
 from random import random
-from networkx import Graph, DiGraph, relabel_nodes
+from networkx import Graph
 from networkx.readwrite import json_graph
 import json
+import pickle
+import hashlib
 from math import floor
-from heapq import nsmallest
 import csv
+import numpy as np
+from copy import copy
+from functools import partial
+from multiprocessing import Pool
 
 from plyj.model import *
 from plyj.parser import Parser
+from ply.lex import LexToken
 
-from utils import sample
-from java_printer import JavaPrinter
+from utils import WeightedSampler, IndexedHeap, Histogram, gc_paused
+from columns import save_table
+from graph import IndexedDiGraph, AssociationGraph
+from java_printer import JavaPrinter, NullWriter, invocations_in
 
 
-class Codebase:
+INITIAL_CLASSES_FILE = path.join(path.dirname(__file__), '..', 'App.java')
+# parsed initial classes are cached here, keyed by the content of the Java file
+CACHE_DIR = os.environ.get('CODEVO_CACHE_DIR', path.join(path.expanduser('~'), '.cache', 'codevo'))
+
+
+# parser of the current process, built on first use
+_parser = None
+# source positions recorded by the parser, by id of parsed element
+_spans = {}
+_calls = {}
+_headers = {}
+# version of the parsed classes in the cache, changed when they are annotated differently
+CACHE_VERSION = 4
+
+
+def _cache_file_name(source, cache_dir):
+    return path.join(cache_dir, 'classes-%d-%s.pickle' % (CACHE_VERSION, hashlib.sha256(source).hexdigest()))
+
+
+def _recording(reduce):
+    """
+    Wrap a grammar rule of the parser to record the span of the source text of each element it
+    returns in _spans, and the positions of the name and the closing parenthesis of each method
+    invocation it creates in _calls. The headers of classes and methods, up to their body, are
+    recorded in _headers with the positions of their name and closing parenthesis, which plyj
+    rules pass up in dicts. Spans skip empty rules, whose positions are those of the next token.
+    """
+    def recording_reduce(p):
+        reduce(p)
+        first = last = None
+        for symbol in p.slice[1:]:
+            if isinstance(symbol, LexToken):
+                start, end = symbol.lexpos, symbol.lexpos + len(str(symbol.value))
+            else:
+                start, end = symbol.span
+            if start is not None:
+                if first is None:
+                    first = start
+                last = end
+        p.slice[0].span = (first, last)
+        element = p[0]
+        if isinstance(element, dict) and 'name' in element:
+            for symbol in p.slice[1:]:
+                if isinstance(symbol, LexToken):
+                    if symbol.type == 'NAME' and symbol.value == element['name']:
+                        element['name_start'] = symbol.lexpos
+                    elif symbol.type == ')':
+                        element['close_start'] = symbol.lexpos
+        if isinstance(element, (ClassDeclaration, MethodDeclaration)) and isinstance(p[1], dict):
+            header = p[1]
+            _headers[id(element)] = (p.slice[1].span, header.get('name_start'), header.get('close_start'))
+        if isinstance(element, SourceElement) and first is not None:
+            _spans[id(element)] = (first, last)
+            if isinstance(element, MethodInvocation):
+                for i in range(len(p.slice) - 2, 0, -1):
+                    symbol = p.slice[i]
+                    if symbol.type == 'NAME' and symbol.value == element.name and p.slice[i + 1].type == '(':
+                        _calls[id(element)] = (symbol.lexpos, last - 1)
+                        break
+                        break
+    return recording_reduce
+
+
+def _new_parser():
+    parser = Parser()
+    for production in parser.parser.productions:
+        if production.callable is not None:
+            production.callable = _recording(production.callable)
+    return parser
+
+
+def _parse(code):
+    """
+    :return: the parsed compilation unit, annotated by _annotate_sources, or None on a syntax error
+    """
+    global _parser
+    if _parser is None:
+        _parser = _new_parser()
+    # plyj marks compilation units with this prefix
+    text = '++' + code
+    _parser.lexer.lineno = 1
+    try:
+        tree = _parser.parser.parse(text, lexer=_parser.lexer, tracking=True)
+        if tree is not None:
+            _annotate_sources(tree.type_declarations, text)
+        return tree
+    finally:
+        _spans.clear()
+        _calls.clear()
+        _headers.clear()
+
+
+def _annotate_sources(type_declarations, text):
+    """
+    Keep the source of the classes parsed from text, for printing: the text of class
+    and method headers in source_header, and of method body statements, other class
+    members, and the targets and arguments of method invocations in source, as
+    (start, column of the first line, text). Method invocations and declarations, and
+    classes, get the position of their name, and of the parenthesis closing their
+    arguments or parameters and how many there are, in source_signature, so they can
+    be printed after being renamed or given new arguments or parameters. Classes also
+    get the span of their extends clause in source_extends, and bodyless methods that
+    of their abstract and native modifiers in source_modifiers, to remove them.
+    """
+    def source_of(start, end):
+        line_start = text.rfind('\n', 0, start) + 1
+        # the first line starts after the prefix of the compilation unit
+        column = start - max(line_start, 2)
+        return start, column, text[start:end]
+
+    def keep_source(element):
+        if isinstance(element, SourceElement) and id(element) in _spans:
+            element.source = source_of(*_spans[id(element)])
+
+    def keep_header(element, count):
+        if id(element) in _headers:
+            (start, end), name_start, close_start = _headers[id(element)]
+            if name_start is not None:
+                element.source_header = source_of(start, end)
+                element.source_signature = (name_start, element.name, close_start, count)
+                return start, name_start
+        return None
+
+    def keep_calls(element):
+        for invocation in invocations_in(element):
+            if id(invocation) in _calls:
+                name_start, close_start = _calls[id(invocation)]
+                invocation.source_signature = (name_start, invocation.name, close_start, len(invocation.arguments))
+                keep_source(invocation.target)
+                for argument in invocation.arguments:
+                    keep_source(argument)
+
+    for c in type_declarations:
+        if not isinstance(c, ClassDeclaration):
+            continue
+        if keep_header(c, 0) and c.extends is not None and id(c.extends) in _spans:
+            start, end = _spans[id(c.extends)]
+            while text[start - 1].isspace():
+                start -= 1
+            c.source_extends = (start, end)
+        for member in c.body:
+            if isinstance(member, MethodDeclaration):
+                header = keep_header(member, len(member.parameters))
+                if header and member.body is None:
+                    start, name_start = header
+                    member.source_modifiers = [(start + m.start(), m.end() - m.start()) for m in
+                                               re.finditer(r'\b(abstract|native)\s+', text[start:name_start])]
+                for stmt in member.body or []:
+                    keep_calls(stmt)
+                    keep_source(stmt)
+            else:
+                keep_calls(member)
+                keep_source(member)
+
+
+def _load_cache(source, cache_dir):
+    """
+    :return: the cached type declarations of source, or None
+    """
+    try:
+        with open(_cache_file_name(source, cache_dir), 'rb') as cache_file:
+            return pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # missing, or written by an incompatible version of plyj
+        return None
+
+
+def parse_java_file(java_file_name, cache_dir=CACHE_DIR):
+    """
+    Parse a Java file, or load it from cache_dir if a file with the same content was parsed before.
+    Building the parser dominates the time of creating a codebase, so the cache makes it
+    much faster. A changed file gets a new cache entry.
+    :param cache_dir: directory of the cache, or None to always parse
+    :return: the type declarations of the file, with their source, see _annotate_sources
+    """
+    with open(java_file_name, 'rb') as java_file:
+        source = java_file.read()
+    if cache_dir:
+        type_declarations = _load_cache(source, cache_dir)
+        if type_declarations is not None:
+            return type_declarations
+    tree = _parse(source.decode(errors='replace'))
+    if tree is None:
+        logging.warning('Skipping %s: syntax error' % java_file_name)
+        return []
+    if cache_dir:
+        cache_file_name = _cache_file_name(source, cache_dir)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write to a temporary file first, so concurrent readers never see a partial entry
+            temp_file_name = '%s.%d.tmp' % (cache_file_name, os.getpid())
+            with open(temp_file_name, 'wb') as cache_file:
+                pickle.dump(tree.type_declarations, cache_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file_name, cache_file_name)
+        except OSError:
+            pass
+    return tree.type_declarations
+
+
+def parse_initial_classes(source=INITIAL_CLASSES_FILE, jobs=None, cache_dir=CACHE_DIR):
+    """
+    :param source: a Java file, or a directory whose Java files are parsed in a process pool of jobs workers
+    :param cache_dir: directory caching the parsed files, or None to always parse
+    :return: the class declarations of the initial codebase
+    """
+    with gc_paused():
+        if path.isdir(source):
+            java_file_names = sorted(path.join(root, name)
+                                     for root, dirs, files in os.walk(source)
+                                     for name in files if name.endswith('.java'))
+            files = [None] * len(java_file_names)
+            if cache_dir:
+                for i, java_file_name in enumerate(java_file_names):
+                    with open(java_file_name, 'rb') as java_file:
+                        files[i] = _load_cache(java_file.read(), cache_dir)
+            # only files missing from the cache are sent to the pool
+            missing = [i for i, type_declarations in enumerate(files) if type_declarations is None]
+            if missing:
+                with Pool(jobs) as pool:
+                    parsed = pool.map(partial(parse_java_file, cache_dir=cache_dir),
+                                      [java_file_names[i] for i in missing], chunksize=16)
+                for i, type_declarations in zip(missing, parsed):
+                    files[i] = type_declarations
+        else:
+            files = [parse_java_file(source, cache_dir)]
+        return [declaration for type_declarations in files for declaration in type_declarations
+                if isinstance(declaration, ClassDeclaration)]
+
+
+class _LineCounter(JavaPrinter):
+    """
+    Counts the lines of a printed class and of each of its methods in one pass
+    """
     def __init__(self):
+        super(_LineCounter, self).__init__(NullWriter())
+        # method name -> number of lines
+        self.method_lines = {}
+
+    def visit_MethodDeclaration(self, method_declaration):
+        start = self.lines
+        super(_LineCounter, self).visit_MethodDeclaration(method_declaration)
+        self.method_lines[method_declaration.name] = self.lines - start
+        return False
+
+
+def _simple_name(name):
+    return name.value.rsplit('.', 1)[-1]
+
+
+def _unique_name(name, graph, suffixes):
+    """
+    :param suffixes: last suffix tried for each name, to avoid scanning the same suffixes again
+    :return: name, or name with a numeric suffix that is not a node of graph
+    """
+    unique_name = name
+    while unique_name in graph:
+        suffixes[name] = suffixes.get(name, 0) + 1
+        unique_name = '%s_%d' % (name, suffixes[name])
+    return unique_name
+
+
+class _Call:
+    """
+    A call statement in the compact method bodies of Codebase, which are lists of
+    _Call, int for the generated declaration 'int var<n> = <n>;', and plyj
+    statements kept from the initial classes. The name of the invoked method is
+    the name of callee_id. target is a class name, or the target parsed from an
+    initial class. arguments are local variable or parameter names, int literals,
+    or parsed expressions.
+    """
+    __slots__ = ['callee_id', 'target', 'arguments', 'num_local_variables']
+
+    def __init__(self, callee_id, target, arguments, num_local_variables):
+        """
+        :param num_local_variables: number of local variables declared before the call
+        """
+        self.callee_id = callee_id
+        self.target = target
+        self.arguments = arguments
+        self.num_local_variables = num_local_variables
+
+
+def _variable_declaration(number):
+    """
+    :return: plyj declaration of the local variable number, as encoded by an int in a method body
+    """
+    return VariableDeclaration(
+        type='int',
+        variable_declarators=[VariableDeclarator(
+            variable=Variable(
+                name='var' + str(number)
+            ),
+            initializer=Literal(number)
+        )]
+    )
+
+
+def _argument(argument):
+    if isinstance(argument, str):
+        return Name(argument)
+    if isinstance(argument, int):
+        return Literal(argument)
+    return argument
+
+
+class Codebase:
+    def __init__(self, commit_log=None, initial_classes=None, rng=None):
+        """
+        :param commit_log: CommitLog receiving every commit, or None to discard them
+        :param initial_classes: class declarations to start from, as returned by parse_initial_classes.
+        They are copied, so they can be shared by several codebases.
+        :param rng: source of random numbers such as utils.RandomStream, or None for the global random module
+        """
+        self._random = rng.random if rng is not None else random
         self.counter = 0
-        self._revisions = []
-        with open(path.join(path.dirname(__file__), '..', 'App.java')) as java_file:
-            parser = Parser()
-            tree = parser.parse_file(java_file)
-            initial_classes = tree.type_declarations
-        self._inheritance_graph = DiGraph()
-        self._method_call_graph = DiGraph()
-
-        for c in initial_classes:
-            self._inheritance_graph.add_node(c.name, {'class': c})
-            for m in c.body:
-                if isinstance(m, MethodDeclaration):
-                    self._method_call_graph.add_node(m.name,
-                                                  {'method': m,
-                                                   'class_name': c.name,
-                                                   'fitness': random()
-                                                   })
+        self._commit_log = commit_log
+        # lines: number of lines of the printed class
+        self._inheritance_graph = IndexedDiGraph('class', 'lines')
+        # lines: number of lines the method adds to its class
+        # call_sites: caller id -> [_Call]
+        # local_variables: names of local variables in declaration order
+        self._method_call_graph = IndexedDiGraph('method', 'class_id', 'fitness', 'lines', 'call_sites',
+                                                 'local_variables')
+        self._classes = self._inheritance_graph.columns['class']
+        self._class_lines = self._inheritance_graph.columns['lines']
+        # number of classes of each size in lines
+        self._class_sizes = Histogram()
+        # classes linked by inheritance or method calls, weighted by the number of call sites and inheritance edges
+        self._associations = AssociationGraph()
+        self._methods = self._method_call_graph.columns['method']
+        self._method_classes = self._method_call_graph.columns['class_id']
+        self._fitness = self._method_call_graph.columns['fitness']
+        self._method_lines = self._method_call_graph.columns['lines']
+        self._call_sites = self._method_call_graph.columns['call_sites']
+        self._local_variables = self._method_call_graph.columns['local_variables']
+        # calls of the initial classes nested in other statements, or in members other than methods:
+        # callee id -> {caller id, or None for other members -> [(MethodInvocation,
+        # number of local variables declared before it)]}
+        self._nested_calls = {}
+        # methods and classes weighted by their sizes for random selection
+        self._method_sampler = WeightedSampler(rng)
+        self._class_sampler = WeightedSampler(rng)
+        # methods ordered by fitness
+        self._fitness_heap = IndexedHeap()
+        # ids of abstract and native methods of the initial classes, until statements are added to them
+        self._bodyless = set()
+
+        with gc_paused():
+            if initial_classes is None:
+                initial_classes = parse_initial_classes()
+            else:
+                # much faster than deepcopy for large ASTs
+                initial_classes = pickle.loads(pickle.dumps(initial_classes, pickle.HIGHEST_PROTOCOL))
+            # method ids by class id and declared name, before duplicate names are made unique
+            declared_methods = {}
+            suffixes = {}
+            for c in initial_classes:
+                # the simulation identifies classes and methods by name
+                c.name = _unique_name(c.name, self._inheritance_graph, suffixes)
+                methods = [m for m in c.body if isinstance(m, MethodDeclaration)]
+                # lines are counted once the classes are linked
+                class_id = self._add_class(c, 0)
+                for m in methods:
+                    declared_name = m.name
+                    m.name = _unique_name(m.name, self._method_call_graph, suffixes)
+                    bodyless = m.body is None
+                    if bodyless:
+                        # abstract methods get an empty body to grow
+                        m.body = []
+                    local_variables = [vd.variable.name
+                                       for stmt in m.body if isinstance(stmt, VariableDeclaration)
+                                       for vd in stmt.variable_declarators]
+                    method_id = self._add_method(m, class_id, local_variables, 0)
+                    if bodyless:
+                        self._bodyless.add(method_id)
+                    declared_methods.setdefault((class_id, declared_name), []).append(method_id)
+            self._link_initial_classes(declared_methods)
+            for class_id in list(self._inheritance_graph.ids()):
+                # as printed, so that save() writes as many lines as counted
+                line_counter = _LineCounter()
+                self.class_declaration(self._inheritance_graph.name_of(class_id)).accept(line_counter)
+                self._resize_class(class_id, line_counter.lines)
+                for method_name, lines in line_counter.method_lines.items():
+                    self._method_lines[self._method_call_graph.id_of(method_name)] = lines
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_commit_log'] = None
+        return state
+
+    def set_commit_log(self, commit_log):
+        """
+        Send the following commits to commit_log, e.g. after restoring from a checkpoint
+        """
+        self._commit_log = commit_log
 
     def get_class_name(self, method_name):
-        return self._method_call_graph.node[method_name]['class_name']
+        return self._inheritance_graph.name_of(self._method_classes[self._method_call_graph.id_of(method_name)])
 
     def size_of(self, method_name):
-        return len(self._method_call_graph.node[method_name]['method'].body)
+        return len(self._methods[self._method_call_graph.id_of(method_name)].body)
 
     def number_of_methods(self):
         return len(self._method_call_graph)
@@ -47,103 +433,193 @@ class Codebase:
     def number_of_classes(self):
         return len(self._inheritance_graph)
 
+    def statistics(self):
+        """
+        Summary statistics of the graphs, read from incrementally maintained counts
+        :return: dict of statistic name to value
+        """
+        method_graph = self._method_call_graph
+        class_graph = self._inheritance_graph
+        num_methods = len(method_graph)
+        return {'methods': num_methods,
+                'classes': len(class_graph),
+                'calls': method_graph.number_of_edges(),
+                'inheritance': class_graph.number_of_edges(),
+                'lines': sum(lines * count for lines, count in self._class_sizes.items()),
+                'mean_ref_count': method_graph.number_of_edges() / num_methods if num_methods else 0.0,
+                'max_ref_count': method_graph.in_degrees.max(),
+                'max_subclasses': class_graph.in_degrees.max(),
+                'max_class_lines': self._class_sizes.max(),
+                'associations': self._associations.number_of_edges(),
+                'max_degree': self._associations.degrees.max()}
+
+    def distributions(self):
+        """
+        :return: dict of distribution name to sorted list of (value, number of methods or classes)
+        """
+        return {'ref_count': self._method_call_graph.in_degrees.items(),
+                'subclasses': self._inheritance_graph.in_degrees.items(),
+                'class_lines': self._class_sizes.items(),
+                'degree': self._associations.degrees.items()}
+
     def has_method(self, method_name):
-        return self._method_call_graph.has_node(method_name)
+        return method_name in self._method_call_graph
+
+    def is_deletable(self, method_name):
+        """
+        :return: whether the method can be deleted, i.e. no other method or member of the initial
+        classes calls it from within another statement
+        """
+        method_id = self._method_call_graph.id_of(method_name)
+        return all(caller_id == method_id for caller_id in self._nested_calls.get(method_id, ()))
 
     def choose_random_method(self):
         """
         Choose a random method, weighted by its size
         :return: the method name
         """
-        return sample([(method_name, len(data['method'].body) + 1)
-                       for method_name, data in self._method_call_graph.nodes_iter(True)])
+        return self._method_call_graph.name_of(self._method_sampler.sample())
 
     def choose_random_class(self):
         """
         Choose a random class, weighted by its size
         :return: the class name
         """
-        return sample([(class_name, len(data['class'].body) + 1)
-                       for class_name, data in self._inheritance_graph.nodes_iter(data=True)])
+        return self._inheritance_graph.name_of(self._class_sampler.sample())
 
     def least_fit_methods(self, n=1):
         """
         :return: the name of the method with smallest fitness value
         """
-        return nsmallest(n, self._method_call_graph,
-                         key=lambda method_name: self._method_call_graph.node[method_name]['fitness'])
+        return [self._method_call_graph.name_of(method_id) for method_id in self._fitness_heap.smallest(n)]
 
     def choose_random_neighbor(self, method_name):
-        neighbors = self._method_call_graph.neighbors(method_name)
+        neighbors = self._method_call_graph.successors(self._method_call_graph.id_of(method_name))
         num_neighbors = len(neighbors)
         if num_neighbors > 0:
-            return neighbors[floor(random() * num_neighbors)]
+            return self._method_call_graph.name_of(list(neighbors)[floor(self._random() * num_neighbors)])
         else:
             return None
 
+    def number_of_callers(self, method_name):
+        graph = self._method_call_graph
+        return graph.in_degree(graph.id_of(method_name))
+
+    def class_degree(self, class_name):
+        """
+        :return: number of classes associated with the class by inheritance or method calls
+        """
+        return self._associations.degree(self._inheritance_graph.id_of(class_name))
+
+    def coupling(self, class_name1, class_name2):
+        """
+        :return: number of call sites and inheritance relations between the two classes
+        """
+        class_graph = self._inheritance_graph
+        return self._associations.weight(class_graph.id_of(class_name1), class_graph.id_of(class_name2))
+
     def caller_names(self, method_name):
         """
         :param method_name:
         :return: caller method names iterator
         """
-        return self._method_call_graph.predecessors_iter(method_name)
+        graph = self._method_call_graph
+        return (graph.name_of(caller_id) for caller_id in list(graph.predecessors(graph.id_of(method_name))))
 
     def method_invocations(self, method_name):
         """
-        Generator for MethodInvocation instances of method_name
+        Generator for MethodInvocation instances of method_name, materialized from the call sites
         :param method_name:
         :return:
         """
-        for caller_name in self._method_call_graph.predecessors_iter(method_name):
-            caller = self._method_call_graph.node[caller_name]['method']
-            for stmt in caller.body:
-                if Codebase.is_invocation(stmt, method_name):
-                    yield stmt.expression
+        for sites in self._call_sites[self._method_call_graph.id_of(method_name)].values():
+            for call in sites:
+                yield self._materialize_call(call)
+
+    def class_declaration(self, class_name):
+        """
+        :return: plyj ClassDeclaration of the class, e.g. for JavaPrinter, materialized from
+        the compact method bodies. Changes to it don't affect the codebase.
+        """
+        klass = copy(self._classes[self._inheritance_graph.id_of(class_name)])
+        klass.body = [self._materialize_method(m) if isinstance(m, MethodDeclaration) else m for m in klass.body]
+        return klass
 
     def create_method(self, class_name):
         """
         The created methods are static methods for now
         """
-        klass = self._inheritance_graph.node[class_name]['class']
+        class_id = self._inheritance_graph.id_of(class_name)
+        klass = self._classes[class_id]
         method = MethodDeclaration(
             'method' + str(self.counter),
             body=[], modifiers=['static'])
         self.counter += 1
         klass.body.append(method)
-        method_info = {'method': method, 'class_name': class_name, 'fitness': random()}
-        self._method_call_graph.add_node(method.name, method_info)
+        # the method header and the closing brace
+        self._add_method(method, class_id, [], 2)
+        self._resize_class(class_id, 2)
+        self._class_sampler.increase(class_id)
         return 1, method.name
 
     def delete_method(self, method_name):
         """
         Delete the method and update callers
-        :param method_name:
+        :param method_name: a method for which is_deletable is true
         :return:
         """
+        if not self.is_deletable(method_name):
+            raise ValueError('%s is called from within other statements' % method_name)
+        method_id = self._method_call_graph.id_of(method_name)
+        class_id = self._method_classes[method_id]
+        # unlink the classes of its callers and callees
+        for caller_id in self._method_call_graph.predecessors(method_id):
+            self._associations.add_edge(self._method_classes[caller_id], class_id,
+                                        -self._num_calls(caller_id, method_id))
+        for callee_id in self._method_call_graph.successors(method_id):
+            if callee_id != method_id:
+                self._associations.add_edge(class_id, self._method_classes[callee_id],
+                                            -self._num_calls(method_id, callee_id))
         # remove method invocation
-        method_info = self._method_call_graph.node[method_name]
-        method = method_info['method']
+        self._nested_calls.pop(method_id, None)
+        method = self._methods[method_id]
         change_size = len(method.body)
-        for caller_name in self._method_call_graph.predecessors_iter(method_name):
-            caller_info = self._method_call_graph.node[caller_name]
-            caller = caller_info['method']
-            old_size = len(caller.body)
-            caller.body = [stmt for stmt in caller.body
-                           if not Codebase.is_invocation(stmt, method_name)
-                           ]
-            change_size += old_size - len(caller.body)
-            caller_info['fitness'] = random()
-        class_name = method_info['class_name']
-        klass = self._inheritance_graph.node[class_name]['class']
+        for caller_id, sites in self._call_sites[method_id].items():
+            caller = self._methods[caller_id]
+            invocations = set(id(call) for call in sites)
+            caller.body = [stmt for stmt in caller.body if id(stmt) not in invocations]
+            change_size += len(sites)
+            if caller_id != method_id:
+                self._method_sampler.set(caller_id, len(caller.body) + 1)
+                self._method_lines[caller_id] -= len(sites)
+                self._resize_class(self._method_classes[caller_id], -len(sites))
+            self._update_fitness(caller_id)
+        klass = self._classes[class_id]
         klass.body.remove(method)
+        self._resize_class(class_id, -self._method_lines[method_id])
+        for callee_id in self._method_call_graph.successors(method_id):
+            if callee_id != method_id:
+                del self._call_sites[callee_id][method_id]
+                if callee_id in self._nested_calls:
+                    self._nested_calls[callee_id].pop(method_id, None)
         self._method_call_graph.remove_node(method_name)
+        self._bodyless.discard(method_id)
+        self._method_sampler.remove(method_id)
+        self._fitness_heap.remove(method_id)
+        self._class_sampler.increase(class_id, -1)
         if len(klass.body) == 0:
             # remove inheritance from all subclasses
-            for subclass_name in self._inheritance_graph.predecessors_iter(class_name):
-                subclass = self._inheritance_graph.node[subclass_name]['class']
+            for subclass_id in self._inheritance_graph.predecessors(class_id):
+                subclass = self._classes[subclass_id]
                 subclass.extends = None
                 change_size += 1
-            self._inheritance_graph.remove_node(class_name)
+                self._associations.remove_edge(subclass_id, class_id)
+            for superclass_id in self._inheritance_graph.successors(class_id):
+                self._associations.remove_edge(class_id, superclass_id)
+            self._associations.remove_node(class_id)
+            self._class_sizes.remove(self._class_lines[class_id])
+            self._inheritance_graph.remove_node(klass.name)
+            self._class_sampler.remove(class_id)
             change_size += 1
         return change_size
 
@@ -152,44 +628,42 @@ class Codebase:
         if superclass_name:
             klass.extends = Type(Name(superclass_name))
         self.counter += 1
-        self._inheritance_graph.add_node(klass.name, {'class': klass})
+        # the class header and the closing brace
+        class_id = self._add_class(klass, 2)
         if superclass_name:
-            self._inheritance_graph.add_edge(klass.name, superclass_name)
+            self._add_inheritance(class_id, self._inheritance_graph.id_of(superclass_name))
         return 1, klass.name
 
     def add_method_call(self, caller_name, callee_name):
-        callee_info = self._method_call_graph.node[callee_name]
-        caller_info = self._method_call_graph.node[caller_name]
-        caller = caller_info['method']
-        num_params = len(callee_info['method'].parameters)
+        caller_id = self._method_call_graph.id_of(caller_name)
+        callee_id = self._method_call_graph.id_of(callee_name)
+        caller = self._methods[caller_id]
+        num_params = len(self._methods[callee_id].parameters)
+        local_variables = self._local_variables[caller_id]
         # trying to find enough variables for the method arguments
-        arguments = []
-        for p in caller.parameters:
-            if len(arguments) >= num_params:
-                break
-            else:
-                arguments.append(Name(p.variable.name))
-        for s in caller.body:
-            if len(arguments) >= num_params:
-                break
-            if isinstance(s, VariableDeclaration):
-                for vd in s.variable_declarators:
-                    arguments.append(Name(vd.variable.name))
+        arguments = [p.variable.name for p in caller.parameters[:num_params]]
+        arguments.extend(local_variables[:num_params - len(arguments)])
         while len(arguments) < num_params:
-            arguments.append(Literal(self.counter))
-        target_name = callee_info['class_name']
-        ref = MethodInvocation(callee_name, arguments, target=Name(target_name))
-        caller.body.append(ExpressionStatement(ref))
-        self._method_call_graph.add_edge(caller_name, callee_name)
-        caller_info['fitness'] = random()
+            arguments.append(self.counter)
+        target_name = self._inheritance_graph.name_of(self._method_classes[callee_id])
+        call = _Call(callee_id, target_name, arguments, len(local_variables))
+        caller.body.append(call)
+        self._call_sites[callee_id].setdefault(caller_id, []).append(call)
+        self._add_call(caller_id, callee_id)
+        self._method_sampler.increase(caller_id)
+        self._add_lines(caller_id)
+        self._update_fitness(caller_id)
         return 1
 
     def add_statement(self, method_name):
-        method_info = self._method_call_graph.node[method_name]
-        method = method_info['method']
-        stmt = self.create_variable_declaration()
-        method.body.append(stmt)
-        method_info['fitness'] = random()
+        method_id = self._method_call_graph.id_of(method_name)
+        method = self._methods[method_id]
+        method.body.append(self.counter)
+        self._local_variables[method_id].append('var' + str(self.counter))
+        self.counter += 1
+        self._method_sampler.increase(method_id)
+        self._add_lines(method_id)
+        self._update_fitness(method_id)
         return 1
 
     def add_parameter(self, method_name):
@@ -198,133 +672,353 @@ class Codebase:
         :param method_name:
         :return:
         """
-        method_info = self._method_call_graph.node[method_name]
-        method = method_info['method']
-        parameters = method.parameters
+        method_id = self._method_call_graph.id_of(method_name)
+        parameters = self._methods[method_id].parameters
         parameters.append(FormalParameter(Variable('param%d' % len(parameters)), Type(Name('int'))))
         change_size = 1
-        for caller_name in self._method_call_graph.predecessors_iter(method_name):
-            caller_info = self._method_call_graph.node[caller_name]
-            caller = caller_info['method']
-            local_variables = [p.variable.name for p in caller.parameters]
-            for s in caller.body:
-                if isinstance(s, VariableDeclaration):
-                    for vd in s.variable_declarators:
-                        local_variables.append(vd.variable.name)
-                elif Codebase.is_invocation(s, method_name):
-                    if len(local_variables) > 0:
-                        s.expression.arguments.append(Name(local_variables[-1]))
-                    else:
-                        s.expression.arguments.append(Literal(self.counter))
-                change_size += 1
-            caller_info['fitness'] = random()
+        for caller_id, sites in self._call_sites[method_id].items():
+            caller = self._methods[caller_id]
+            local_variables = self._local_variables[caller_id]
+            for call in sites:
+                call.arguments.append(self._new_argument(caller, local_variables, call.num_local_variables))
+            for invocation, num_local_variables in self._nested_calls.get(method_id, {}).get(caller_id, ()):
+                invocation.arguments.append(_argument(self._new_argument(caller, local_variables,
+                                                                         num_local_variables)))
+            change_size += len(caller.body)
+            self._update_fitness(caller_id)
+        for invocation, _ in self._nested_calls.get(method_id, {}).get(None, ()):
+            invocation.arguments.append(_argument(self.counter))
+            change_size += 1
         return change_size
 
+    def _new_argument(self, caller, local_variables, num_local_variables):
+        """
+        :return: the argument passed for a new parameter by a call, as encoded in _Call.arguments:
+        the last variable declared before the call, or the last parameter of the caller, or a literal
+        """
+        if num_local_variables > 0:
+            return local_variables[num_local_variables - 1]
+        elif len(caller.parameters) > 0:
+            return caller.parameters[-1].variable.name
+        else:
+            return self.counter
+
     def move_method(self, method_name, to_class_name):
-        method_info = self._method_call_graph.node[method_name]
-        from_class_name = method_info['class_name']
-        if from_class_name == to_class_name:
+        method_id = self._method_call_graph.id_of(method_name)
+        from_class_id = self._method_classes[method_id]
+        to_class_id = self._inheritance_graph.id_of(to_class_name)
+        if from_class_id == to_class_id:
             return 0
-        method = method_info['method']
-        from_class_body = self._inheritance_graph.node[from_class_name]['class'].body
-        from_class_body.remove(method)
-        to_class_body = self._inheritance_graph.node[to_class_name]['class'].body
-        to_class_body.append(method)
-        method_info['class_name'] = to_class_name
+        method = self._methods[method_id]
+        self._classes[from_class_id].body.remove(method)
+        self._classes[to_class_id].body.append(method)
+        self._method_classes[method_id] = to_class_id
+        self._move_associations(method_id, from_class_id, to_class_id)
+        self._class_sampler.increase(from_class_id, -1)
+        self._class_sampler.increase(to_class_id)
+        self._resize_class(from_class_id, -self._method_lines[method_id])
+        self._resize_class(to_class_id, self._method_lines[method_id])
         change_size = len(method.body)
         # update references
-        for method_invocation in self.method_invocations(method_name):
-            method_invocation.target = Name(to_class_name)
-            change_size += 1
+        for sites in self._call_sites[method_id].values():
+            for call in sites:
+                call.target = to_class_name
+            change_size += len(sites)
         return change_size
 
     def rename_method(self, method_name):
         new_name = 'method%d' % self.counter
         self.counter += 1
-        method_info = self._method_call_graph.node[method_name]
-        method_info['method'].name = new_name
-        change_size = 1
-        for inv in self.method_invocations(method_name):
-            inv.name = new_name
-            change_size += 1
-        relabel_nodes(self._method_call_graph, {method_name: new_name}, copy=False)
-        method_info['fitness'] = random()
+        method_id = self._method_call_graph.id_of(method_name)
+        self._methods[method_id].name = new_name
+        # the call sites are named after the callee
+        change_size = 1 + sum(len(sites) for sites in self._call_sites[method_id].values())
+        for invocations in self._nested_calls.get(method_id, {}).values():
+            for invocation, _ in invocations:
+                invocation.name = new_name
+            change_size += len(invocations)
+        self._method_call_graph.rename_node(method_name, new_name)
+        self._update_fitness(method_id)
         return change_size, new_name
 
-    def create_variable_declaration(self):
+    def save(self, output_dir, save_src, graph_format='json'):
         """
-        :return: the new variable declaration
+        :param graph_format: 'json' for methods.json and classes.json, 'columnar' for tables of
+        .npy columns with integer ids (see columns.load_table), or 'both'
         """
-        var = VariableDeclaration(
-            type='int',
-            variable_declarators=[VariableDeclarator(
-                variable=Variable(
-                    name='var' + str(self.counter)
-                ),
-                initializer=Literal(self.counter)
-            )]
-        )
-        self.counter += 1
-        return var
-
-    def save(self, output_dir, save_src):
-        with open(path.join(output_dir, 'commits.csv'), 'w', newline='') as commits_file:
-            writer = csv.DictWriter(commits_file, ['min_fitness', 'change_size'])
-            writer.writeheader()
-            writer.writerows(self._revisions)
-
+        method_graph = self._method_call_graph
+        class_graph = self._inheritance_graph
         with open(path.join(output_dir, 'methods.csv'), 'w', newline='') as methods_file:
             writer = csv.DictWriter(methods_file, ['method', 'class', 'ref_count'])
             writer.writeheader()
-            for method_name, in_degree in self._method_call_graph.in_degree_iter():
+            for method_name in method_graph:
+                method_id = method_graph.id_of(method_name)
                 writer.writerow({
                     'method': method_name,
-                    'class': self._method_call_graph.node[method_name]['class_name'],
-                    'ref_count': in_degree
+                    'class': class_graph.name_of(self._method_classes[method_id]),
+                    'ref_count': method_graph.in_degree(method_id)
                 })
 
-        with open(path.join(output_dir, 'methods.json'), 'w') as methods_file:
-            data = json_graph.node_link_data(self._method_call_graph)
-            json.dump(data, methods_file, skipkeys=True, default=lambda d: None)
-
-        association_graph = Graph()
-        for e in self._method_call_graph.edges_iter():
-            association_graph.add_edge(
-                self._method_call_graph.node[e[0]]['class_name'],
-                self._method_call_graph.node[e[1]]['class_name'])
-        for e in self._inheritance_graph.edges_iter():
-            association_graph.add_edge(*e)
+        if graph_format != 'columnar':
+            with open(path.join(output_dir, 'methods.json'), 'w') as methods_file:
+                nx_graph = method_graph.to_networkx('method', 'fitness')
+                for method_name in nx_graph:
+                    nx_graph.node[method_name]['class_name'] = self.get_class_name(method_name)
+                data = json_graph.node_link_data(nx_graph)
+                json.dump(data, methods_file, skipkeys=True, default=lambda d: None)
+
         with open(path.join(output_dir, 'classes.csv'), 'w', newline='') as classes_file:
             writer = csv.DictWriter(classes_file, ['class', 'subclasses', 'lines', 'degree'])
             writer.writeheader()
-            for class_name, in_degree in self._inheritance_graph.in_degree_iter():
-                klass = self._inheritance_graph.node[class_name]['class']
-                java_printer = JavaPrinter()
-                klass.accept(java_printer)
+            for class_name in class_graph:
+                class_id = class_graph.id_of(class_name)
                 writer.writerow({'class': class_name,
-                                 'subclasses': in_degree,
-                                 'lines': java_printer.result.count('\n') + 1,
-                                 'degree': association_graph.degree(class_name)
-                                 if class_name in association_graph else 0
+                                 'subclasses': class_graph.in_degree(class_id),
+                                 'lines': self._class_lines[class_id],
+                                 'degree': self._associations.degree(class_id)
                                  })
-                if save_src:
-                    with open(path.join(output_dir, 'src', class_name + '.java'), 'w') as java_file:
-                        java_file.write(java_printer.result)
 
-        with open(path.join(output_dir, 'classes.json'), 'w') as classes_file:
-            data = json_graph.node_link_data(association_graph)
-            json.dump(data, classes_file, skipkeys=True)
+        if graph_format != 'columnar':
+            association_graph = Graph()
+            for a, b, weight in self._associations.edges():
+                association_graph.add_edge(class_graph.name_of(a), class_graph.name_of(b), weight=weight)
+            with open(path.join(output_dir, 'classes.json'), 'w') as classes_file:
+                data = json_graph.node_link_data(association_graph)
+                json.dump(data, classes_file, skipkeys=True)
 
-    def commit(self, change_size):
-        self._revisions.append({
-            'min_fitness': min(self._method_call_graph.node[method_name]['fitness']
-                               for method_name in self._method_call_graph),
-            'change_size': change_size
+        if graph_format != 'json':
+            self._save_columns(output_dir)
+
+        if save_src:
+            for class_name in class_graph:
+                with open(path.join(output_dir, 'src', class_name + '.java'), 'w') as java_file:
+                    self.class_declaration(class_name).accept(JavaPrinter(java_file))
+
+    def _save_columns(self, output_dir):
+        """
+        Save the methods, classes, calls, inheritance and associations tables. Methods and
+        classes are numbered by their rows, in the order of methods.csv and classes.csv.
+        """
+        method_graph = self._method_call_graph
+        class_graph = self._inheritance_graph
+        method_ids = list(method_graph.ids())
+        class_ids = list(class_graph.ids())
+        method_rows = {method_id: i for i, method_id in enumerate(method_ids)}
+        class_rows = {class_id: i for i, class_id in enumerate(class_ids)}
+        save_table(output_dir, 'methods', {
+            'name': np.array(list(method_graph), dtype=str),
+            'class': np.array([class_rows[self._method_classes[i]] for i in method_ids], dtype=np.int64),
+            'fitness': np.array([self._fitness[i] for i in method_ids], dtype=np.float64),
+            'lines': np.array([self._method_lines[i] for i in method_ids], dtype=np.int64),
+            'ref_count': np.array([method_graph.in_degree(i) for i in method_ids], dtype=np.int64)
         })
+        save_table(output_dir, 'classes', {
+            'name': np.array(list(class_graph), dtype=str),
+            'subclasses': np.array([class_graph.in_degree(i) for i in class_ids], dtype=np.int64),
+            'lines': np.array([self._class_lines[i] for i in class_ids], dtype=np.int64),
+            'degree': np.array([self._associations.degree(i) for i in class_ids], dtype=np.int64)
+        })
+        for table, (source, target), edges, rows in [
+                ('calls', ('caller', 'callee'), method_graph.edges(), method_rows),
+                ('inheritance', ('subclass', 'superclass'), class_graph.edges(), class_rows)]:
+            edges = np.array([(rows[a], rows[b]) for a, b in edges], dtype=np.int64).reshape(-1, 2)
+            save_table(output_dir, table, {source: edges[:, 0], target: edges[:, 1]})
+        associations = np.array([(class_rows[a], class_rows[b], weight)
+                                 for a, b, weight in sorted(self._associations.edges())], dtype=np.int64).reshape(-1, 3)
+        save_table(output_dir, 'associations', {'source': associations[:, 0], 'target': associations[:, 1],
+                                                'weight': associations[:, 2]})
+
+    def commit(self, change_size):
+        if self._commit_log is not None:
+            self._commit_log.append(self._fitness_heap.min_key(), change_size)
+
+    def _add_method(self, method, class_id, local_variables, lines):
+        fitness = self._random()
+        method_id = self._method_call_graph.add_node(method.name, method=method, class_id=class_id, fitness=fitness,
+                                                     lines=lines, call_sites={}, local_variables=local_variables)
+        self._method_sampler.add(method_id, len(method.body) + 1)
+        self._fitness_heap.push(method_id, fitness)
+        return method_id
+
+    def _link_initial_classes(self, declared_methods):
+        """
+        Build the inheritance graph and the call graph of the initial classes.
+
+        Names are resolved through indexes of classes and methods by their declared names.
+        A call resolves to a method of the target class, or of the calling class if there
+        is no target, searching up their superclasses. Calls on other targets, e.g. variables,
+        resolve to the only method declared with that name, if there is one. Other calls,
+        e.g. to library methods, are ignored. Calls nested in other statements are added to
+        the call graph, and indexed in _nested_calls, so they are renamed and given new
+        arguments with their callee, but keep their targets when it moves, and their callee
+        can't be deleted. Calls that are statements on their own line are call sites, like the
+        calls added by the simulation; plyj parses those as bare MethodInvocations. Calls from
+        other members, i.e. constructors, initializers, fields and inner classes, are only
+        indexed in _nested_calls, under the caller id None.
+        """
+        class_graph = self._inheritance_graph
+        for class_id in class_graph.ids():
+            extends = self._classes[class_id].extends
+            if extends is not None and isinstance(extends.name, Name) and _simple_name(extends.name) in class_graph:
+                self._add_inheritance(class_id, class_graph.id_of(_simple_name(extends.name)))
+        methods_by_name = {}
+        for (class_id, name), method_ids in declared_methods.items():
+            methods_by_name.setdefault(name, []).extend(method_ids)
+        for caller_id in list(self._method_call_graph.ids()):
+            class_id = self._method_classes[caller_id]
+            body = self._methods[caller_id].body
+            num_local_variables = 0
+            for i, stmt in enumerate(body):
+                for invocation in invocations_in(stmt):
+                    callee_id = self._resolve_call(class_id, invocation, declared_methods, methods_by_name)
+                    if callee_id is None:
+                        continue
+                    invocation.name = self._methods[callee_id].name
+                    sites = self._call_sites[callee_id].setdefault(caller_id, [])
+                    if (stmt is invocation or isinstance(stmt, ExpressionStatement) and stmt.expression is invocation) \
+                            and '\n' not in getattr(stmt, 'source', (0, 0, ''))[2]:
+                        call = body[i] = _Call(callee_id, invocation.target, invocation.arguments,
+                                               num_local_variables)
+                        sites.append(call)
+                    else:
+                        self._nested_calls.setdefault(callee_id, {}).setdefault(caller_id, []).append(
+                            (invocation, num_local_variables))
+                    self._add_call(caller_id, callee_id)
+                if isinstance(stmt, VariableDeclaration):
+                    num_local_variables += len(stmt.variable_declarators)
+        for class_id in class_graph.ids():
+            for member in self._classes[class_id].body:
+                if isinstance(member, MethodDeclaration):
+                    continue
+                for invocation in invocations_in(member):
+                    callee_id = self._resolve_call(class_id, invocation, declared_methods, methods_by_name)
+                    if callee_id is not None:
+                        invocation.name = self._methods[callee_id].name
+                        self._nested_calls.setdefault(callee_id, {}).setdefault(None, []).append((invocation, 0))
+
+    def _resolve_call(self, class_id, invocation, declared_methods, methods_by_name):
+        """
+        :return: id of the method invoked from the class, or None, see _link_initial_classes
+        """
+        class_graph = self._inheritance_graph
+        target = invocation.target
+        if target is None or target == 'this':
+            return self._find_method(class_id, invocation.name, declared_methods)
+        elif target == 'super':
+            superclass_ids = class_graph.successors(class_id)
+            return self._find_method(next(iter(superclass_ids)), invocation.name, declared_methods) \
+                if superclass_ids else None
+        elif isinstance(target, Name) and _simple_name(target) in class_graph:
+            return self._find_method(class_graph.id_of(_simple_name(target)), invocation.name, declared_methods)
+        candidates = methods_by_name.get(invocation.name, [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def _add_class(self, klass, lines):
+        class_id = self._inheritance_graph.add_node(klass.name, lines=lines, **{'class': klass})
+        self._class_sizes.add(lines)
+        self._associations.add_node(class_id)
+        self._class_sampler.add(class_id, len(klass.body) + 1)
+        return class_id
+
+    def _add_inheritance(self, class_id, superclass_id):
+        if self._inheritance_graph.add_edge(class_id, superclass_id):
+            self._associations.add_edge(class_id, superclass_id)
+
+    def _add_call(self, caller_id, callee_id):
+        """
+        Link the classes of the caller and the callee for one more call site
+        """
+        self._method_call_graph.add_edge(caller_id, callee_id)
+        self._associations.add_edge(self._method_classes[caller_id], self._method_classes[callee_id])
+
+    def _num_calls(self, caller_id, callee_id):
+        """
+        :return: the number of call sites of the callee in the caller, nested ones included
+        """
+        num_calls = len(self._call_sites[callee_id].get(caller_id, ()))
+        return num_calls + len(self._nested_calls.get(callee_id, {}).get(caller_id, ()))
+
+    def _move_associations(self, method_id, from_class_id, to_class_id):
+        """
+        Move the associations made by the calls of a method to another class
+        """
+        associations = self._associations
+        method_graph = self._method_call_graph
+        for neighbor_id in method_graph.predecessors(method_id):
+            num_calls = self._num_calls(neighbor_id, method_id)
+            if neighbor_id == method_id:
+                associations.add_edge(from_class_id, from_class_id, -num_calls)
+                associations.add_edge(to_class_id, to_class_id, num_calls)
+            else:
+                neighbor_class_id = self._method_classes[neighbor_id]
+                associations.add_edge(from_class_id, neighbor_class_id, -num_calls)
+                associations.add_edge(to_class_id, neighbor_class_id, num_calls)
+        for neighbor_id in method_graph.successors(method_id):
+            if neighbor_id != method_id:
+                num_calls = self._num_calls(method_id, neighbor_id)
+                neighbor_class_id = self._method_classes[neighbor_id]
+                associations.add_edge(from_class_id, neighbor_class_id, -num_calls)
+                associations.add_edge(to_class_id, neighbor_class_id, num_calls)
+
+    def _find_method(self, class_id, declared_name, declared_methods):
+        """
+        :return: id of a method declared as declared_name in the class or its superclasses, or None
+        """
+        visited = set()
+        while class_id not in visited:
+            visited.add(class_id)
+            method_ids = declared_methods.get((class_id, declared_name))
+            if method_ids:
+                return method_ids[0]
+            superclass_ids = self._inheritance_graph.successors(class_id)
+            if not superclass_ids:
+                return None
+            class_id = next(iter(superclass_ids))
+        return None
+
+    def _add_lines(self, method_id):
+        """
+        Count the line of a statement added to the method, and the closing brace of the
+        body it gets if it had none
+        """
+        lines = 1
+        if method_id in self._bodyless:
+            self._bodyless.remove(method_id)
+            lines += 1
+        self._method_lines[method_id] += lines
+        self._resize_class(self._method_classes[method_id], lines)
+
+    def _resize_class(self, class_id, delta):
+        lines = self._class_lines[class_id]
+        self._class_lines[class_id] = lines + delta
+        self._class_sizes.move(lines, lines + delta)
+
+    def _update_fitness(self, method_id):
+        """
+        Assign a new random fitness to a changed method
+        """
+        fitness = self._random()
+        self._fitness[method_id] = fitness
+        self._fitness_heap.update(method_id, fitness)
+
+    def _materialize_method(self, method):
+        method = copy(method)
+        if self._method_call_graph.id_of(method.name) in self._bodyless:
+            method.body = None
+        else:
+            method.body = [self._materialize_statement(stmt) for stmt in method.body]
+        return method
 
-    @staticmethod
-    def is_invocation(stmt, method_name):
-        return isinstance(stmt, ExpressionStatement) and \
-               isinstance(stmt.expression, MethodInvocation) and \
-               stmt.expression.name == method_name
+    def _materialize_statement(self, stmt):
+        if isinstance(stmt, _Call):
+            return ExpressionStatement(self._materialize_call(stmt))
+        if isinstance(stmt, int):
+            return _variable_declaration(stmt)
+        return stmt
 
+    def _materialize_call(self, call):
+        target = call.target
+        if isinstance(target, str) and target not in ('this', 'super'):
+            target = Name(target)
+        return MethodInvocation(self._method_call_graph.name_of(call.callee_id),
+                                [_argument(a) for a in call.arguments], target=target)
@@ -0,0 +1,30 @@
+"""
+Tables stored as one NumPy .npy file per column, <table>.<column>.npy, so
+they can be loaded by memory-mapping instead of parsing text.
+"""
+from os import path
+from glob import glob, escape
+
+import numpy as np
+
+
+def save_table(output_dir, table, columns):
+    """
+    :param columns: dict of column name to sequence of values, all of the same length
+    """
+    for column, values in columns.items():
+        np.save(path.join(output_dir, '%s.%s.npy' % (table, column)), np.asarray(values))
+
+
+def load_table(output_dir, table, mmap=True):
+    """
+    Load a table written by save_table
+    :return: dict of column name to numpy array
+    """
+    prefix = path.join(output_dir, table + '.')
+    file_names = glob(escape(prefix) + '*.npy')
+    if not file_names:
+        raise FileNotFoundError('No columns of table %s in %s' % (table, output_dir))
+    return {file_name[len(prefix):-len('.npy')]: np.load(file_name, mmap_mode='r' if mmap else None)
+            for file_name in file_names}
+
@@ -0,0 +1,112 @@
+import os
+from os import path
+from array import array
+import csv
+
+import numpy as np
+
+FIELDS = ['min_fitness', 'change_size']
+# binary columns, stored as raw native-endian arrays
+COLUMN_TYPES = {'min_fitness': 'd', 'change_size': 'q'}
+
+
+def open_log_file(output_dir, name, offsets, binary=False, **kwargs):
+    """
+    Open a log file for writing. If offsets has the size of the file at a checkpoint,
+    the file is cut back to that size and appended to.
+    """
+    file_name = path.join(output_dir, name)
+    mode = 'b' if binary else ''
+    if name in offsets and path.exists(file_name):
+        os.truncate(file_name, offsets[name])
+        return open(file_name, 'a' + mode, **kwargs)
+    return open(file_name, 'w' + mode, **kwargs)
+
+
+class CommitLog:
+    """
+    Writes commits to output_dir as they happen, buffering at most
+    flush_interval commits in memory.
+
+    With write_csv, commits are appended to commits.csv. With write_binary,
+    each field is appended to commits.<field>.bin, which can be read with
+    load_commits or numpy.fromfile.
+
+    To continue a log from a checkpoint, pass the state returned by
+    checkpoint() as resume_from: existing files are cut back to the sizes they
+    had at the checkpoint and appended to.
+    """
+    def __init__(self, output_dir, write_csv=True, write_binary=False, flush_interval=10000,
+                 resume_from=None):
+        self._flush_interval = flush_interval
+        self._columns = {field: array(COLUMN_TYPES[field]) for field in FIELDS}
+        self._files = []
+        self._csv_writer = None
+        self._binary_files = None
+        self.count = resume_from['count'] if resume_from else 0
+        offsets = resume_from['offsets'] if resume_from else {}
+        if write_csv:
+            csv_file = open_log_file(output_dir, 'commits.csv', offsets, newline='')
+            self._files.append(csv_file)
+            self._csv_writer = csv.writer(csv_file)
+            if csv_file.tell() == 0:
+                self._csv_writer.writerow(FIELDS)
+        if write_binary:
+            self._binary_files = {field: open_log_file(output_dir, 'commits.%s.bin' % field, offsets, binary=True)
+                                  for field in FIELDS}
+            self._files.extend(self._binary_files.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append(self, min_fitness, change_size):
+        self._columns['min_fitness'].append(min_fitness)
+        self._columns['change_size'].append(change_size)
+        self.count += 1
+        if len(self._columns['change_size']) >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._csv_writer:
+            self._csv_writer.writerows(zip(*(self._columns[field] for field in FIELDS)))
+        if self._binary_files:
+            for field in FIELDS:
+                self._columns[field].tofile(self._binary_files[field])
+        for f in self._files:
+            f.flush()
+        for field in FIELDS:
+            del self._columns[field][:]
+
+    def checkpoint(self):
+        """
+        Flush buffered commits
+        :return: state to pass as resume_from when continuing this log
+        """
+        self.flush()
+        return {'count': self.count,
+                'offsets': {path.basename(f.name): f.tell() for f in self._files}}
+
+    def close(self):
+        self.flush()
+        for f in self._files:
+            f.close()
+        self._files = []
+
+
+def load_commits(output_dir, mmap=True):
+    """
+    Load the binary commit log written by CommitLog
+    :return: dict of field name to numpy array
+    """
+    commits = {}
+    for field in FIELDS:
+        file_name = path.join(output_dir, 'commits.%s.bin' % field)
+        dtype = np.dtype(COLUMN_TYPES[field])
+        if mmap and path.getsize(file_name) > 0:
+            commits[field] = np.memmap(file_name, dtype=dtype, mode='r')
+        else:
+            commits[field] = np.fromfile(file_name, dtype=dtype)
+    return commits
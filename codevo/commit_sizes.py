@@ -0,0 +1,157 @@
+"""
+Commit sizes of a simulation run, aggregated from its commit log.
+
+Each row of the commit log is a change, with the minimum fitness of the
+codebase after it. Consecutive changes are aggregated into one commit until
+the minimum fitness reaches the equilibrium threshold f0. With mean_min_size,
+a commit also has to reach a minimum size, drawn from a lognormal
+distribution with that mean log (and standard deviation 1) after every
+commit. This is a port of get_commit_sizes and get_change_sizes in analysis.R,
+which reads the log in chunks with memory and time linear in its length.
+
+    python3 codevo/commit_sizes.py output --f0 0.5 -o output/commit_sizes.csv
+"""
+import sys
+import csv
+from math import ceil
+from os import path
+from itertools import islice
+from argparse import ArgumentParser
+
+import numpy as np
+
+from commit_log import load_commits
+
+# rows of the commit log processed at a time
+CHUNK_SIZE = 1000000
+# minimum commit sizes drawn at a time
+DRAW_BATCH = 1024
+
+
+def read_commits(output_dir, chunk_size=CHUNK_SIZE):
+    """
+    Read the commit log of output_dir in chunks, from the binary log if it was written, else from commits.csv
+    :return: iterator of (min_fitness, change_size) numpy arrays
+    """
+    if path.exists(path.join(output_dir, 'commits.change_size.bin')):
+        commits = load_commits(output_dir)
+        for start in range(0, len(commits['change_size']), chunk_size):
+            yield commits['min_fitness'][start:start + chunk_size], commits['change_size'][start:start + chunk_size]
+        return
+    with open(path.join(output_dir, 'commits.csv')) as commits_file:
+        fields = next(commits_file).strip().split(',')
+        fitness_column, size_column = fields.index('min_fitness'), fields.index('change_size')
+        while True:
+            lines = list(islice(commits_file, chunk_size))
+            if not lines:
+                break
+            rows = np.loadtxt(lines, delimiter=',', ndmin=2)
+            yield rows[:, fitness_column], rows[:, size_column].astype(np.int64)
+
+
+class CommitSizes:
+    """
+    Aggregates chunks of the commit log into commit sizes. Call update with every
+    chunk, in order, then finish.
+    """
+    def __init__(self, f0, mean_min_size=None, rng=None):
+        """
+        :param rng: numpy Generator drawing the minimum sizes, or None for a fresh one
+        """
+        self._f0 = f0
+        self._mean_min_size = mean_min_size
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._min_sizes = iter(())
+        # size of the changes since the last commit
+        self._size = 0
+        self._min_size = self._draw() if mean_min_size is not None else 0
+
+    def _draw(self):
+        min_size = next(self._min_sizes, None)
+        if min_size is None:
+            self._min_sizes = iter(self._rng.lognormal(self._mean_min_size, 1, DRAW_BATCH).tolist())
+            min_size = next(self._min_sizes)
+        return min_size
+
+    def update(self, min_fitness, change_size):
+        """
+        :return: numpy array of the sizes of the commits completed in this chunk
+        """
+        # size since the last commit before the chunk, after each change
+        sizes = self._size + np.cumsum(change_size, dtype=np.int64)
+        if len(sizes) == 0:
+            return sizes
+        # sizes are non-decreasing, so commit points can be found by binary search
+        candidates = sizes[np.asarray(min_fitness) >= self._f0]
+        if self._mean_min_size is None:
+            commits = np.diff(candidates, prepend=0)
+            base = candidates[-1] if len(candidates) else 0
+        else:
+            commits = []
+            base = 0
+            i = 0
+            while True:
+                # sizes are integers, so comparing with the rounded up minimum size avoids converting them
+                i += np.searchsorted(candidates[i:], base + ceil(self._min_size))
+                if i >= len(candidates):
+                    break
+                commits.append(candidates[i] - base)
+                base = int(candidates[i])
+                i += 1
+                self._min_size = self._draw()
+            commits = np.array(commits, dtype=np.int64)
+        self._size = int(sizes[-1]) - int(base)
+        return commits
+
+    def finish(self):
+        """
+        :return: size of the changes after the last commit, or None if there are none
+        """
+        return self._size if self._size > 0 else None
+
+
+def commit_sizes(chunks, f0, mean_min_size=None, rng=None):
+    """
+    Port of get_commit_sizes in analysis.R
+    :param chunks: iterator of (min_fitness, change_size) arrays, e.g. from read_commits
+    :return: numpy array of commit sizes, including the changes after the last commit if any
+    """
+    aggregator = CommitSizes(f0, mean_min_size, rng)
+    sizes = [aggregator.update(min_fitness, change_size) for min_fitness, change_size in chunks]
+    rest = aggregator.finish()
+    if rest is not None:
+        sizes.append(np.array([rest], dtype=np.int64))
+    return np.concatenate(sizes) if sizes else np.empty(0, dtype=np.int64)
+
+
+def change_sizes(chunks, f0):
+    """
+    Port of get_change_sizes in analysis.R, which always ends with the size of the changes after
+    the last equilibrium, even if it is 0
+    :param chunks: iterator of (min_fitness, change_size) arrays, e.g. from read_commits
+    """
+    aggregator = CommitSizes(f0)
+    sizes = [aggregator.update(min_fitness, change_size) for min_fitness, change_size in chunks]
+    sizes.append(np.array([aggregator.finish() or 0], dtype=np.int64))
+    return np.concatenate(sizes)
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser(description='Aggregate the commit log of a run into commit sizes')
+    arg_parser.add_argument('output_dir', type=str, help='output directory of the run')
+    arg_parser.add_argument('--f0', dest='f0', type=float, required=True, help='equilibrium fitness threshold')
+    arg_parser.add_argument('--mean-min-size', dest='mean_min_size', type=float, default=None,
+                            help='mean log of the lognormal minimum commit size')
+    arg_parser.add_argument('--seed', dest='seed', type=int, default=None, help='seed for the minimum sizes')
+    arg_parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=CHUNK_SIZE,
+                            help='number of rows of the commit log read at a time')
+    arg_parser.add_argument('-o', dest='output', type=str, default=None,
+                            help='output CSV file (default: commit_sizes.csv in the output directory)')
+    options = arg_parser.parse_args(sys.argv[1:])
+    sizes = commit_sizes(read_commits(options.output_dir, options.chunk_size), options.f0, options.mean_min_size,
+                         np.random.default_rng(options.seed))
+    with open(options.output or path.join(options.output_dir, 'commit_sizes.csv'), 'w', newline='') as sizes_file:
+        writer = csv.writer(sizes_file)
+        writer.writerow(['commit_size'])
+        writer.writerows([size] for size in sizes.tolist())
+    print('Number of commits:', len(sizes))
@@ -0,0 +1,128 @@
+"""
+Events of the team during a simulation, written as time series.
+
+The manager and developers report typed events to an EventLog, which buffers
+them in columns and appends them to three CSV files: team.csv has the team
+size after every developer joins, tasks.csv has the size of the task queue
+after every task is created or assigned, and work.csv has the time, the
+developer and the change size of every commit. Without an EventLog, the
+team doesn't record anything.
+"""
+import csv
+from os import path
+from array import array
+
+from commit_log import open_log_file
+
+# columns of each file, with their array type codes
+STREAMS = {
+    'team': [('time', 'd'), ('developers', 'q')],
+    'tasks': [('time', 'd'), ('event', 'b'), ('tasks', 'q')],
+    'work': [('time', 'd'), ('developer', 'q'), ('change_size', 'q')]
+}
+TASK_EVENTS = ['created', 'assigned']
+
+
+class EventLog:
+    """
+    Writes events to output_dir, buffering at most flush_interval events in
+    memory. checkpoint() flushes the buffered events, so its state is only
+    the sizes of the three files. Given that state as resume_from, the files
+    are cut back to those sizes and appended to, dropping the events that
+    were written after the checkpoint.
+    """
+    def __init__(self, output_dir, flush_interval=10000, resume_from=None):
+        self._flush_interval = flush_interval
+        self._buffered = 0
+        offsets = resume_from['offsets'] if resume_from else {}
+        self._columns = {}
+        self._files = []
+        self._writers = {}
+        for stream, columns in STREAMS.items():
+            self._columns[stream] = [array(type_code) for _, type_code in columns]
+            log_file = open_log_file(output_dir, stream + '.csv', offsets, newline='')
+            self._files.append(log_file)
+            self._writers[stream] = csv.writer(log_file)
+            if log_file.tell() == 0:
+                self._writers[stream].writerow([name for name, _ in columns])
+        # bound appends of the columns, to keep recording cheap
+        self._team = [c.append for c in self._columns['team']]
+        self._tasks = [c.append for c in self._columns['tasks']]
+        self._work = [c.append for c in self._columns['work']]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def developer_joined(self, time, developers):
+        """
+        :param developers: team size after the developer joined
+        """
+        append_time, append_developers = self._team
+        append_time(time)
+        append_developers(developers)
+        self._added()
+
+    def task_created(self, time, tasks):
+        """
+        :param tasks: size of the task queue after the task was created
+        """
+        self._task_event(time, 0, tasks)
+
+    def task_assigned(self, time, tasks):
+        """
+        :param tasks: size of the task queue after the task was assigned
+        """
+        self._task_event(time, 1, tasks)
+
+    def _task_event(self, time, event, tasks):
+        append_time, append_event, append_tasks = self._tasks
+        append_time(time)
+        append_event(event)
+        append_tasks(tasks)
+        self._added()
+
+    def commit(self, time, developer, change_size):
+        """
+        :param developer: index of the developer in the team, in the order they joined
+        """
+        append_time, append_developer, append_change_size = self._work
+        append_time(time)
+        append_developer(developer)
+        append_change_size(change_size)
+        self._added()
+
+    def _added(self):
+        self._buffered += 1
+        if self._buffered >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        for stream, columns in self._columns.items():
+            if stream == 'tasks':
+                time, event, tasks = columns
+                rows = zip(time, (TASK_EVENTS[e] for e in event), tasks)
+            else:
+                rows = zip(*columns)
+            self._writers[stream].writerows(rows)
+            for column in columns:
+                del column[:]
+        for f in self._files:
+            f.flush()
+        self._buffered = 0
+
+    def checkpoint(self):
+        """
+        Flush buffered events
+        :return: state to pass as resume_from when continuing this log
+        """
+        self.flush()
+        return {'offsets': {path.basename(f.name): f.tell() for f in self._files}}
+
+    def close(self):
+        self.flush()
+        for f in self._files:
+            f.close()
+        self._files = []
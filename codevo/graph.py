@@ -0,0 +1,229 @@
+from networkx import DiGraph
+
+from utils import Histogram
+
+
+class IndexedDiGraph:
+    """
+    Directed graph whose nodes are identified by small integer ids.
+
+    Names are mapped to ids, so renaming a node is O(1) and does not touch its
+    edges. Adjacency is kept in per-node dicts used as ordered sets, so neighbors
+    are iterated in the order they were added, which pickling preserves, and node
+    attributes in columns indexed by id. Ids of removed nodes are recycled. The distribution of
+    in-degrees is kept up to date in in_degrees, a utils.Histogram.
+    """
+    def __init__(self, *attributes):
+        self._ids = {}
+        self._names = []
+        self._successors = []
+        self._predecessors = []
+        self._free = []
+        self._num_edges = 0
+        self.in_degrees = Histogram()
+        self.columns = {attribute: [] for attribute in attributes}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def id_of(self, name):
+        return self._ids[name]
+
+    def name_of(self, node_id):
+        return self._names[node_id]
+
+    def ids(self):
+        return self._ids.values()
+
+    def add_node(self, name, **attributes):
+        """
+        :return: the id of the new node
+        """
+        if self._free:
+            node_id = self._free.pop()
+            self._names[node_id] = name
+        else:
+            node_id = len(self._names)
+            self._names.append(name)
+            self._successors.append({})
+            self._predecessors.append({})
+            for column in self.columns.values():
+                column.append(None)
+        self._ids[name] = node_id
+        self.in_degrees.add(0)
+        for attribute, value in attributes.items():
+            self.columns[attribute][node_id] = value
+        return node_id
+
+    def remove_node(self, name):
+        node_id = self._ids.pop(name)
+        self._num_edges -= len(self._successors[node_id]) + len(self._predecessors[node_id]) - \
+            (node_id in self._successors[node_id])
+        in_degrees = self.in_degrees
+        in_degrees.remove(len(self._predecessors[node_id]))
+        for successor in self._successors[node_id]:
+            if successor != node_id:
+                in_degree = len(self._predecessors[successor])
+                in_degrees.move(in_degree, in_degree - 1)
+            self._predecessors[successor].pop(node_id, None)
+        for predecessor in self._predecessors[node_id]:
+            self._successors[predecessor].pop(node_id, None)
+        self._successors[node_id] = {}
+        self._predecessors[node_id] = {}
+        self._names[node_id] = None
+        for column in self.columns.values():
+            column[node_id] = None
+        self._free.append(node_id)
+
+    def rename_node(self, old_name, new_name):
+        node_id = self._ids.pop(old_name)
+        self._ids[new_name] = node_id
+        self._names[node_id] = new_name
+
+    def add_edge(self, source_id, target_id):
+        """
+        :return: whether the edge is new
+        """
+        if target_id in self._successors[source_id]:
+            return False
+        self._successors[source_id][target_id] = None
+        predecessors = self._predecessors[target_id]
+        self.in_degrees.move(len(predecessors), len(predecessors) + 1)
+        predecessors[source_id] = None
+        self._num_edges += 1
+        return True
+
+    def remove_edge(self, source_id, target_id):
+        del self._successors[source_id][target_id]
+        predecessors = self._predecessors[target_id]
+        self.in_degrees.move(len(predecessors), len(predecessors) - 1)
+        del predecessors[source_id]
+        self._num_edges -= 1
+
+    def successors(self, node_id):
+        """
+        :return: the successor ids, in the order their edges were added
+        """
+        return self._successors[node_id].keys()
+
+    def predecessors(self, node_id):
+        """
+        :return: the predecessor ids, in the order their edges were added
+        """
+        return self._predecessors[node_id].keys()
+
+    def in_degree(self, node_id):
+        return len(self._predecessors[node_id])
+
+    def out_degree(self, node_id):
+        return len(self._successors[node_id])
+
+    def number_of_edges(self):
+        return self._num_edges
+
+    def edges(self):
+        """
+        :return: iterator of (source id, target id)
+        """
+        for source_id in self._ids.values():
+            for target_id in self._successors[source_id]:
+                yield source_id, target_id
+
+    def to_networkx(self, *attributes):
+        """
+        Export the graph as a NetworkX DiGraph keyed by node names
+        :param attributes: node attributes to copy
+        """
+        graph = DiGraph()
+        for name, node_id in self._ids.items():
+            graph.add_node(name, {attribute: self.columns[attribute][node_id] for attribute in attributes})
+        names = self._names
+        graph.add_edges_from((names[source_id], names[target_id]) for source_id, target_id in self.edges())
+        return graph
+
+
+class AssociationGraph:
+    """
+    Undirected multigraph over node ids, kept as the weight of each pair of
+    nodes, i.e. the number of edges between them. Degrees count the distinct
+    neighbors of a node, a self-loop counting twice, and are O(1); their
+    distribution is kept up to date in degrees, a utils.Histogram. The
+    codebase adds an edge per call site, so repeated calls count.
+    """
+    def __init__(self):
+        # node id -> {neighbor id: weight}
+        self._neighbors = {}
+        self._num_edges = 0
+        self.degrees = Histogram()
+
+    def __len__(self):
+        return len(self._neighbors)
+
+    def add_node(self, node_id):
+        self._neighbors[node_id] = {}
+        self.degrees.add(0)
+
+    def remove_node(self, node_id):
+        """
+        Remove a node, which must have no edges left
+        """
+        assert not self._neighbors[node_id], 'node %d still has edges' % node_id
+        del self._neighbors[node_id]
+        self.degrees.remove(0)
+
+    def add_edge(self, a, b, count=1):
+        """
+        Add count edges between a and b, or remove them if count is negative
+        """
+        if not count:
+            return
+        neighbors = self._neighbors[a]
+        weight = neighbors.get(b, 0) + count
+        if weight == count or weight == 0:
+            # the pair becomes linked or unlinked
+            change = 1 if weight else -1
+            degree_a = self.degree(a)
+            if a == b:
+                self.degrees.move(degree_a, degree_a + 2 * change)
+            else:
+                degree_b = self.degree(b)
+                self.degrees.move(degree_a, degree_a + change)
+                self.degrees.move(degree_b, degree_b + change)
+            self._num_edges += change
+        if weight:
+            neighbors[b] = weight
+            self._neighbors[b][a] = weight
+        else:
+            del neighbors[b]
+            self._neighbors[b].pop(a, None)
+
+    def remove_edge(self, a, b):
+        self.add_edge(a, b, -1)
+
+    def weight(self, a, b):
+        return self._neighbors[a].get(b, 0)
+
+    def degree(self, node_id):
+        neighbors = self._neighbors[node_id]
+        return len(neighbors) + (node_id in neighbors)
+
+    def number_of_edges(self):
+        """
+        :return: number of linked pairs of nodes
+        """
+        return self._num_edges
+
+    def edges(self):
+        """
+        :return: iterator of (smaller node id, larger node id, weight) of linked pairs
+        """
+        for a, neighbors in self._neighbors.items():
+            for b, weight in neighbors.items():
+                if a <= b:
+                    yield a, b, weight
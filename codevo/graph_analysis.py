@@ -1,35 +1,244 @@
+"""
+Degree, clustering and path length statistics of the class association graph.
+
+By default, clustering and transitivity are computed on a sparse adjacency
+matrix, and the average shortest path length of each connected component is
+estimated from breadth-first searches from sampled sources, run in a process
+pool, with a normal confidence interval. Components with no more nodes than
+--sources are measured exactly. --exact computes everything with NetworkX,
+which is only practical for small graphs.
+
+    python3 codevo/graph_analysis.py output/classes.json
+    python3 codevo/graph_analysis.py output --sources 200 --jobs 8
+"""
 __author__ = 'zplin'
 import sys
 import json
 import csv
 from os import path
+from argparse import ArgumentParser
+from multiprocessing import Pool
 import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, shortest_path
+from scipy.stats import norm
 from networkx import Graph, transitivity, clustering, average_shortest_path_length, connected_component_subgraphs
 from networkx.readwrite import json_graph
 
+from columns import load_table
 
-if __name__ == '__main__':
-    with open(sys.argv[1]) as g_file:
+# number of BFS sources per task sent to a worker
+SOURCE_BATCH = 64
+# number of rows of the adjacency matrix multiplied at a time when counting triangles
+ROW_CHUNK = 4096
+
+
+def load_class_graph(file_name):
+    """
+    :param file_name: classes.json, or an output directory saved with the columnar graph format
+    :return: the class association graph, whose nodes are the classes with associations
+    """
+    if path.isdir(file_name):
+        associations = load_table(file_name, 'associations')
+        g = Graph()
+        edges = zip(associations['source'].tolist(), associations['target'].tolist())
+        if 'weight' in associations:
+            g.add_weighted_edges_from((a, b, w) for (a, b), w in zip(edges, associations['weight'].tolist()))
+        else:
+            g.add_edges_from(edges)
+        return g
+    with open(file_name) as g_file:
         data = json.load(g_file)
-        g = Graph(json_graph.node_link_graph(data))
-    print('Number of nodes:', g.number_of_nodes())
-    print('Average degree:', 2 * g.number_of_edges()/g.number_of_nodes())
-    print('Transitivity:', transitivity(g))
+        return Graph(json_graph.node_link_graph(data))
+
+
+def load_adjacency(file_name):
+    """
+    Load the class association graph as a sparse matrix, without building a NetworkX graph
+    :param file_name: classes.json, or an output directory saved with the columnar graph format
+    :return: (node names, symmetric CSR adjacency matrix without self-loops, boolean array of nodes with a self-loop)
+    """
+    if path.isdir(file_name):
+        associations = load_table(file_name, 'associations')
+        names = load_table(file_name, 'classes')['name']
+        # only classes with associations are nodes, as in classes.json
+        nodes, edges = np.unique(np.stack([associations['source'], associations['target']]), return_inverse=True)
+        names = names[nodes]
+        sources, targets = edges.reshape(2, -1)
+    else:
+        with open(file_name) as g_file:
+            data = json.load(g_file)
+        names = np.array([node['id'] for node in data['nodes']])
+        sources = np.array([link['source'] for link in data['links']], dtype=np.int64)
+        targets = np.array([link['target'] for link in data['links']], dtype=np.int64)
+    num_nodes = len(names)
+    self_loops = np.zeros(num_nodes, dtype=bool)
+    self_loops[sources[sources == targets]] = True
+    linked = sources != targets
+    rows = np.concatenate([sources[linked], targets[linked]])
+    columns = np.concatenate([targets[linked], sources[linked]])
+    adjacency = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=(num_nodes, num_nodes))
+    # duplicate edges are summed
+    adjacency.data[:] = 1
+    return names, adjacency, self_loops
+
+
+def count_triangles(adjacency, row_chunk=ROW_CHUNK):
+    """
+    :return: number of triangles through each node of a symmetric adjacency matrix without self-loops
+    """
+    triangles = np.empty(adjacency.shape[0])
+    for start in range(0, adjacency.shape[0], row_chunk):
+        rows = adjacency[start:start + row_chunk]
+        # paths of length 2 that are closed by an edge, each triangle being found in both directions
+        triangles[start:start + row_chunk] = np.asarray((rows @ adjacency).multiply(rows).sum(axis=1)).ravel() / 2
+    return triangles
+
+
+_worker_adjacency = None
+
+
+def _init_worker(adjacency):
+    global _worker_adjacency
+    _worker_adjacency = adjacency
+
+
+def _distance_sums(sources):
+    """
+    :return: sum of the distances from each source to the nodes it reaches
+    """
+    distances = shortest_path(_worker_adjacency, directed=False, unweighted=True, indices=sources)
+    distances[np.isinf(distances)] = 0
+    return distances.sum(axis=1)
+
+
+def path_lengths(adjacency, sources=1000, jobs=None, seed=None, confidence=0.95):
+    """
+    Estimate the average shortest path length of every connected component of more than one node
+    :param sources: number of BFS sources sampled in each component; smaller components are measured exactly
+    :param jobs: number of worker processes (default: all cores)
+    :return: list of dicts with the size, estimated mean, confidence bounds and number of sources of each
+    component, largest first
+    """
+    num_components, labels = connected_components(adjacency, directed=False)
+    sizes = np.bincount(labels, minlength=num_components)
+    rng = np.random.default_rng(seed)
+    order = np.argsort(labels, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    components = [c for c in np.argsort(-sizes, kind='stable') if sizes[c] > 1]
+    sampled = {c: rng.choice(order[offsets[c]:offsets[c + 1]], min(sources, sizes[c]), replace=False)
+               for c in components}
+    all_sources = np.concatenate([sampled[c] for c in components]) if components else np.empty(0, dtype=np.int64)
+    batches = [all_sources[i:i + SOURCE_BATCH] for i in range(0, len(all_sources), SOURCE_BATCH)]
+    if jobs == 1 or len(batches) <= 1:
+        _init_worker(adjacency)
+        sums = [_distance_sums(batch) for batch in batches]
+    else:
+        with Pool(jobs, initializer=_init_worker, initargs=(adjacency,)) as pool:
+            sums = pool.map(_distance_sums, batches)
+    sums = np.concatenate(sums) if sums else np.empty(0)
+    z = norm.ppf(0.5 + confidence / 2)
+    results = []
+    start = 0
+    for c in components:
+        size = sizes[c]
+        k = len(sampled[c])
+        # mean distance from each sampled source to the other nodes of its component
+        means = sums[start:start + k] / (size - 1)
+        start += k
+        mean = float(means.mean())
+        if k < size and k > 1:
+            # standard error with the finite population correction
+            error = float(z * means.std(ddof=1) / np.sqrt(k) * np.sqrt((size - k) / (size - 1)))
+        else:
+            error = 0.0 if k == size else float('inf')
+        results.append({'size': int(size), 'mean': mean, 'low': mean - error, 'high': mean + error,
+                        'sources': int(k)})
+    return results
+
+
+def analyze(file_name, sources=1000, jobs=None, seed=None, confidence=0.95):
+    """
+    :return: dict of the statistics of the class association graph, with the same keys as exact_analyze
+    """
+    names, adjacency, self_loops = load_adjacency(file_name)
+    num_nodes = len(names)
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    triangles = count_triangles(adjacency)
+    triads = degrees * (degrees - 1)
+    cc = np.divide(2 * triangles, triads, out=np.zeros(num_nodes), where=triads > 0)
+    # like NetworkX, self-loops count twice in degrees, but not in clustering
+    full_degrees = degrees + 2 * self_loops
+    return {'nodes': num_nodes,
+            'average_degree': float(full_degrees.sum() / num_nodes),
+            'transitivity': float(2 * triangles.sum() / triads.sum()) if triangles.sum() > 0 else 0.0,
+            'average_clustering': float(cc.mean()),
+            'path_lengths': path_lengths(adjacency, sources, jobs, seed, confidence),
+            'degree_cc': _degree_cc(full_degrees.tolist(), cc.tolist())}
+
+
+def exact_analyze(file_name):
+    """
+    :return: dict of the statistics of the class association graph, computed exactly with NetworkX
+    """
+    g = load_class_graph(file_name)
     cc = clustering(g)
-    print('Average clustering coefficient:', np.mean(list(cc.values())))
+    lengths = []
     for subgraph in connected_component_subgraphs(g):
         if subgraph.number_of_nodes() > 1:
-            print('Average shortest path length for subgraph of', subgraph.number_of_nodes(), ':',
-                  average_shortest_path_length(subgraph))
-    # Calculating average clustering coefficient for different degrees
+            length = average_shortest_path_length(subgraph)
+            lengths.append({'size': subgraph.number_of_nodes(), 'mean': length, 'low': length, 'high': length,
+                            'sources': subgraph.number_of_nodes()})
+    nodes = g.nodes()
+    return {'nodes': g.number_of_nodes(),
+            'average_degree': 2 * g.number_of_edges() / g.number_of_nodes(),
+            'transitivity': transitivity(g),
+            'average_clustering': np.mean(list(cc.values())),
+            'path_lengths': sorted(lengths, key=lambda p: -p['size']),
+            'degree_cc': _degree_cc([g.degree(node) for node in nodes], [cc[node] for node in nodes])}
+
+
+def _degree_cc(degrees, ccs):
+    """
+    :return: dict of degree to the average clustering coefficient of the nodes of that degree
+    """
     degree_cc = {}
-    for node, degree in g.degree_iter():
-        if degree not in degree_cc:
-            degree_cc[degree] = []
-        degree_cc[degree].append(cc[node])
+    for degree, cc in zip(degrees, ccs):
+        degree_cc.setdefault(degree, []).append(cc)
+    return {degree: np.mean(values) for degree, values in sorted(degree_cc.items())}
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser(description='Analyze the class association graph')
+    arg_parser.add_argument('graph', type=str, help='classes.json, or an output directory in the columnar format')
+    arg_parser.add_argument('--exact', dest='exact', action='store_true',
+                            help='compute all statistics exactly with NetworkX, for small graphs')
+    arg_parser.add_argument('--sources', dest='sources', type=int, default=1000,
+                            help='BFS sources sampled per component to estimate path lengths')
+    arg_parser.add_argument('--jobs', dest='jobs', type=int, default=None,
+                            help='number of worker processes (default: all cores)')
+    arg_parser.add_argument('--seed', dest='seed', type=int, default=None, help='seed for sampling sources')
+    arg_parser.add_argument('--confidence', dest='confidence', type=float, default=0.95,
+                            help='confidence level of the path length intervals')
+    options = arg_parser.parse_args(sys.argv[1:])
+    if options.exact:
+        result = exact_analyze(options.graph)
+    else:
+        result = analyze(options.graph, options.sources, options.jobs, options.seed, options.confidence)
+    print('Number of nodes:', result['nodes'])
+    print('Average degree:', result['average_degree'])
+    print('Transitivity:', result['transitivity'])
+    print('Average clustering coefficient:', result['average_clustering'])
+    for p in result['path_lengths']:
+        if p['sources'] < p['size']:
+            print('Average shortest path length for subgraph of', p['size'], ':', p['mean'],
+                  '(%g%% CI %f - %f, %d sources)' % (options.confidence * 100, p['low'], p['high'], p['sources']))
+        else:
+            print('Average shortest path length for subgraph of', p['size'], ':', p['mean'])
 
-    with open(path.join(path.dirname(sys.argv[1]), 'clustering.csv'), 'w', newline='') as cc_file:
+    output_dir = options.graph if path.isdir(options.graph) else path.dirname(options.graph)
+    with open(path.join(output_dir, 'clustering.csv'), 'w', newline='') as cc_file:
         writer = csv.DictWriter(cc_file, ['degree', 'average_cc'])
         writer.writeheader()
-        for degree in degree_cc:
-            writer.writerow({'degree': degree, 'average_cc': np.mean(degree_cc[degree])})
\ No newline at end of file
+        for degree, average_cc in result['degree_cc'].items():
+            writer.writerow({'degree': degree, 'average_cc': average_cc})
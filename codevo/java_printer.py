@@ -1,4 +1,4 @@
-from plyj.model import Visitor
+from plyj.model import Visitor, SourceElement, MethodInvocation
 
 
 class JavaPrinter(Visitor):
@@ -8,101 +8,250 @@ class JavaPrinter(Visitor):
 
     Reason for not implementing it in __str__ method of AST nodes:
     * indents are context-dependent
+
+    The output is collected in a list of strings and joined in result, or
+    written directly to out (any object with a write method) if it is given.
+    lines counts the lines printed so far.
+
+    Elements parsed from Java files carry their source text (see
+    codebase.parse_java_file), and are printed verbatim, reindented, with the
+    current names and added arguments of the method invocations in them. That
+    way statements and members the printer has no visitor for are kept. The
+    headers of parsed classes and methods are printed the same way, with their
+    current names and parameters. Methods without a body are printed with ';'.
     """
-    def __init__(self):
+    def __init__(self, out=None):
         super(JavaPrinter, self).__init__()
-        self.result = ''
+        self._buffer = []
+        self._write = self._buffer.append if out is None else out.write
         self.indent = 0
+        self.lines = 1
+
+    @property
+    def result(self):
+        return ''.join(self._buffer)
+
+    def _print(self, element):
+        """
+        Print a name or type, which plyj stores either as a string or as a node
+        """
+        if isinstance(element, str):
+            self._write(element)
+        else:
+            element.accept(self)
 
     def visit_ClassDeclaration(self, class_declaration):
-        self.result += '    ' * self.indent
-        for m in class_declaration.modifiers:
-            self.result += m + ' '
-
-        self.result += 'class ' + class_declaration.name + ' '
-        if class_declaration.extends:
-            self.result += 'extends '
-            class_declaration.extends.accept(self)
-            self.result += ' '
-        self.result += '{\n'
+        write = self._write
+        write('    ' * self.indent)
+        if getattr(class_declaration, 'source_header', None) is not None:
+            edits = self._signature_edits(class_declaration, [])
+            if class_declaration.extends is None and getattr(class_declaration, 'source_extends', None):
+                start, end = class_declaration.source_extends
+                edits.append((start, end - start, ''))
+            self._print_source(class_declaration.source_header, edits)
+        else:
+            for m in class_declaration.modifiers:
+                # annotations aren't printed
+                if isinstance(m, str):
+                    write(m + ' ')
+            write('class ' + class_declaration.name)
+            if class_declaration.extends:
+                write(' extends ')
+                class_declaration.extends.accept(self)
+        write(' {\n')
+        self.lines += 1
         self.indent += 1
         for elem in class_declaration.body:
-            elem.accept(self)
+            if getattr(elem, 'source', None) is not None:
+                self._print_source(elem.source, self._call_edits(elem), statement=True)
+            else:
+                elem.accept(self)
         self.indent -= 1
-        self.result += '    ' * self.indent + '}'
+        write('    ' * self.indent + '}')
         return False
 
     def visit_MethodDeclaration(self, method_declaration):
-        self.result += '    ' * self.indent
-        for m in method_declaration.modifiers:
-            self.result += m + ' '
-        self.result += method_declaration.return_type
-        self.result += ' '
-        self.result += method_declaration.name
-        self.result += '('
-        for p in method_declaration.parameters:
-            if not self.result.endswith('('):
-                self.result += ', '
-            p.accept(self)
-        self.result += ') {\n'
+        write = self._write
+        write('    ' * self.indent)
+        if getattr(method_declaration, 'source_header', None) is not None:
+            edits = self._signature_edits(method_declaration, method_declaration.parameters)
+            if method_declaration.body is not None:
+                # a body was added to an abstract or native method
+                edits.extend((start, length, '') for start, length in
+                             getattr(method_declaration, 'source_modifiers', ()))
+            self._print_source(method_declaration.source_header, edits)
+        else:
+            for m in method_declaration.modifiers:
+                if isinstance(m, str):
+                    write(m + ' ')
+            self._print(method_declaration.return_type)
+            write(' ')
+            write(method_declaration.name)
+            write('(')
+            for i, p in enumerate(method_declaration.parameters):
+                if i > 0:
+                    write(', ')
+                p.accept(self)
+            write(')')
+        if method_declaration.body is None:
+            write(';\n')
+            self.lines += 1
+            return False
+        write(' {\n')
+        self.lines += 1
         self.indent += 1
         for stmt in method_declaration.body:
-            stmt.accept(self)
+            if getattr(stmt, 'source', None) is not None:
+                self._print_source(stmt.source, self._call_edits(stmt), statement=True)
+            else:
+                stmt.accept(self)
         self.indent -= 1
-        self.result += '    ' * self.indent + '}\n'
+        write('    ' * self.indent + '}\n')
+        self.lines += 1
         return False
 
     def visit_VariableDeclaration(self, variable_declaration):
-        self.result += '    ' * self.indent
-        self.result += variable_declaration.type
-        self.result += ' '
+        write = self._write
+        write('    ' * self.indent)
+        self._print(variable_declaration.type)
+        write(' ')
         for declarator in variable_declaration.variable_declarators:
             declarator.accept(self)
-        self.result += ';\n'
+        write(';\n')
+        self.lines += 1
         return False
 
     def visit_VariableDeclarator(self, variable_declarator):
         variable_declarator.variable.accept(self)
-        self.result += ' = '
-        variable_declarator.initializer.accept(self)
+        if variable_declarator.initializer is not None:
+            self._write(' = ')
+            variable_declarator.initializer.accept(self)
         return False
 
     def visit_Literal(self, literal):
-        self.result += str(literal.value)
+        self._write(str(literal.value))
         return False
 
     def visit_Variable(self, variable):
-        self.result += variable.name
+        self._write(variable.name)
         return False
 
     def visit_Name(self, name):
-        self.result += name.value
+        self._write(name.value)
         return False
 
     def visit_MethodInvocation(self, method):
-        method.target.accept(self)
-        self.result += '.' + method.name + '('
-        for a in method.arguments:
-            if not self.result.endswith('('):
-                self.result += ', '
-            a.accept(self)
-        self.result += ')'
+        if method.target is not None:
+            if getattr(method.target, 'source', None) is not None:
+                self._print_source(method.target.source, self._call_edits(method.target))
+            else:
+                self._print(method.target)
+            self._write('.')
+        self._write(method.name + '(')
+        for i, a in enumerate(method.arguments):
+            if i > 0:
+                self._write(', ')
+            if getattr(a, 'source', None) is not None:
+                self._print_source(a.source, self._call_edits(a))
+            else:
+                a.accept(self)
+        self._write(')')
         return False
 
     def visit_Type(self, type):
-        type.name.accept(self)
+        self._print(type.name)
         for i in range(type.dimensions):
-            self.result += '[]'
+            self._write('[]')
         return False
 
     def visit_ExpressionStatement(self, stmt):
-        self.result += '    ' * self.indent
+        self._write('    ' * self.indent)
         stmt.expression.accept(self)
-        self.result += ';\n'
+        self._write(';\n')
+        self.lines += 1
         return False
 
     def visit_FormalParameter(self, arg):
-        arg.type.accept(self)
-        self.result += ' '
+        self._print(arg.type)
+        self._write(' ')
         arg.variable.accept(self)
         return False
+
+    def _print_source(self, source, edits, statement=False):
+        """
+        Print source text, as kept by codebase.parse_java_file
+        :param edits: (position, length, replacement) of the changes to the text
+        :param statement: print it on lines of its own, as a statement or a member of a class
+        """
+        start, column, text = source
+        for position, length, replacement in sorted(edits, reverse=True):
+            offset = position - start
+            text = text[:offset] + replacement + text[offset + length:]
+        lines = text.split('\n')
+        # continuation lines keep their indentation relative to the first one
+        for i in range(1, len(lines)):
+            line = lines[i]
+            lines[i] = line[min(column, len(line) - len(line.lstrip())):]
+        indent = '    ' * self.indent
+        if statement:
+            self._write(indent + ('\n' + indent).join(lines) + '\n')
+            self.lines += len(lines)
+        else:
+            self._write(('\n' + indent).join(lines))
+            self.lines += len(lines) - 1
+
+    def _call_edits(self, element):
+        """
+        :return: edits of the source of element for the method invocations in it
+        """
+        edits = []
+        for invocation in invocations_in(element):
+            edits.extend(self._signature_edits(invocation, invocation.arguments))
+        return edits
+
+    def _signature_edits(self, element, items):
+        """
+        :param items: the current arguments or parameters of element
+        :return: edits of the source for the current name of element, and the items added to it
+        """
+        signature = getattr(element, 'source_signature', None)
+        if signature is None:
+            return []
+        name_start, name, close_start, count = signature
+        edits = []
+        if element.name != name:
+            edits.append((name_start, len(name), element.name))
+        if close_start is not None and len(items) > count:
+            added = []
+            for item in items[count:]:
+                printer = JavaPrinter()
+                item.accept(printer)
+                added.append(printer.result)
+            edits.append((close_start, 0, (', ' if count else '') + ', '.join(added)))
+        return edits
+
+def invocations_in(element):
+    """
+    :return: the method invocations in the subtree of element, in the order they are printed
+    """
+    invocations = []
+    stack = [element]
+    while stack:
+        element = stack.pop()
+        if isinstance(element, MethodInvocation):
+            invocations.append(element)
+        for field in reversed(element._fields):
+            value = getattr(element, field)
+            if isinstance(value, list):
+                stack.extend(e for e in reversed(value) if isinstance(e, SourceElement))
+            elif isinstance(value, SourceElement):
+                stack.append(value)
+    return invocations
+
+
+class NullWriter:
+    """
+    Discards everything written to it, for printing only to count lines
+    """
+    def write(self, s):
+        pass
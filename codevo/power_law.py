@@ -0,0 +1,309 @@
+"""
+Discrete power-law fits of the distributions produced by the simulation, after
+Clauset, Shalizi and Newman (2009) and the poweRlaw package used in analysis.R.
+
+For every candidate xmin, the exponent alpha is estimated by maximum
+likelihood, all candidates at once, and xmin is chosen to minimize the
+Kolmogorov-Smirnov distance between the data and the fit. The goodness of fit
+p-value is the fraction of synthetic data sets, drawn from the fit and refitted
+the same way, whose distance is at least as large. The bootstrap runs in a
+process pool. The power law is also compared with discrete lognormal and
+exponential fits of the same tail by Vuong's likelihood ratio test.
+
+    python3 codevo/power_law.py output --f0 0.5 --bootstrap 1000 --jobs 8
+    python3 codevo/power_law.py sweep -o power_law.csv
+
+Every directory under the given ones that has a methods.csv, such as the
+replicates of a run or the runs of a sweep, is analyzed, and the results are
+saved in power_law.csv.
+"""
+import os
+import sys
+import csv
+from os import path
+from math import sqrt
+from contextlib import nullcontext
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+import numpy as np
+from scipy.special import zeta, erfc
+from scipy.stats import norm
+from scipy.optimize import minimize
+
+from commit_sizes import commit_sizes, read_commits
+
+# quantity -> (file, column)
+QUANTITIES = {'ref_count': ('methods.csv', 'ref_count'),
+              'degree': ('classes.csv', 'degree'),
+              'lines': ('classes.csv', 'lines')}
+FIELDS = ['directory', 'quantity', 'n', 'xmin', 'alpha', 'n_tail', 'ks', 'p', 'bootstrap',
+          'lognormal_statistic', 'lognormal_p', 'exponential_statistic', 'exponential_p']
+ALPHA_BOUNDS = (1.0001, 10.0)
+GOLDEN_SECTION_STEPS = 60
+# number of cells of the KS matrix computed at a time
+KS_CHUNK = 1 << 22
+# the bootstrap samples are split in this many tasks, enough to balance the load of the
+# workers without sending the data too many times
+BOOTSTRAP_TASKS = 64
+
+
+def _log_likelihood(alpha, xmin, n, log_sum):
+    return -n * np.log(zeta(alpha, xmin)) - alpha * log_sum
+
+
+def _fit_alphas(xmins, n, log_sums):
+    """
+    Maximize the log-likelihood, which is concave in alpha, by golden section search for all xmins at once
+    :param n: number of values at least as large as each xmin
+    :param log_sums: sum of the logarithms of these values
+    """
+    inverse_phi = (sqrt(5) - 1) / 2
+    low = np.full(len(xmins), ALPHA_BOUNDS[0])
+    high = np.full(len(xmins), ALPHA_BOUNDS[1])
+    c = high - inverse_phi * (high - low)
+    d = low + inverse_phi * (high - low)
+    fc = _log_likelihood(c, xmins, n, log_sums)
+    fd = _log_likelihood(d, xmins, n, log_sums)
+    for _ in range(GOLDEN_SECTION_STEPS):
+        # the maximum is in [low, d] if f(c) > f(d), else in [c, high]
+        left = fc > fd
+        high = np.where(left, d, high)
+        low = np.where(left, low, c)
+        new = np.where(left, high - inverse_phi * (high - low), low + inverse_phi * (high - low))
+        f_new = _log_likelihood(new, xmins, n, log_sums)
+        c, d = np.where(left, new, d), np.where(left, c, new)
+        fc, fd = np.where(left, f_new, fd), np.where(left, fc, f_new)
+    return (low + high) / 2
+
+
+def _ks_distances(values, cum_counts, candidates, alphas):
+    """
+    :param values: sorted distinct values of the data
+    :param cum_counts: number of data points up to each value
+    :param candidates: indexes in values of the candidate xmins
+    :return: KS distance between the tail of the data above each candidate and its fit
+    """
+    distances = np.empty(len(candidates))
+    chunk = max(1, KS_CHUNK // len(values))
+    for start in range(0, len(candidates), chunk):
+        rows = candidates[start:start + chunk]
+        first = rows[0]
+        tail_values = values[first:]
+        alpha = alphas[start:start + chunk, None]
+        # number of data points below each xmin
+        before = np.where(rows > 0, cum_counts[np.maximum(rows - 1, 0)], 0)[:, None]
+        n = cum_counts[-1] - before
+        data_cdf = (cum_counts[first:] - before) / n
+        fit_cdf = 1 - zeta(alpha, tail_values + 1.0) / zeta(alpha, values[rows, None].astype(float))
+        differences = np.abs(data_cdf - fit_cdf)
+        # values below each xmin are not part of its tail
+        differences[np.arange(first, len(values)) < rows[:, None]] = 0
+        distances[start:start + chunk] = differences.max(axis=1)
+    return distances
+
+
+def fit_power_law(data, max_xmin=None):
+    """
+    Fit a discrete power law to the positive values of data
+    :param max_xmin: largest xmin considered, to save time on data with many distinct values.
+    The smallest value is considered even if it is larger.
+    :return: dict with the xmin, alpha, n_tail and ks distance of the fit
+    """
+    data = np.asarray(data)
+    data = data[data >= 1]
+    values, counts = np.unique(data, return_counts=True)
+    cum_counts = np.cumsum(counts)
+    # every distinct value but the largest can be xmin
+    candidates = np.arange(max(len(values) - 1, 1))
+    if max_xmin is not None:
+        candidates = candidates[values[candidates] <= max(max_xmin, values[0])]
+    logs = np.log(values) * counts
+    # number of points, and sum of their logarithms, at least as large as each value
+    n = (cum_counts[-1] - cum_counts + counts)[candidates]
+    log_sums = np.cumsum(logs[::-1])[::-1][candidates]
+    xmins = values[candidates].astype(float)
+    alphas = _fit_alphas(xmins, n, log_sums)
+    distances = _ks_distances(values, cum_counts, candidates, alphas)
+    best = int(np.argmin(distances))
+    return {'xmin': int(values[candidates[best]]), 'alpha': float(alphas[best]), 'n_tail': int(n[best]),
+            'ks': float(distances[best])}
+
+
+def sample_power_law(xmin, alpha, size, rng):
+    """
+    Draw from a discrete power law, with the approximation of Clauset et al. (2009), eq. D.6
+    """
+    r = rng.random(size)
+    x = np.floor((xmin - 0.5) * (1 - r) ** (-1 / (alpha - 1)) + 0.5)
+    return np.minimum(x, 2.0 ** 53).astype(np.int64)
+
+
+def _bootstrap_distances(args):
+    """
+    :return: KS distances of the fits of synthetic data sets, one per seed
+    """
+    data, fit, seeds, max_xmin = args
+    below = data[data < fit['xmin']]
+    distances = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        # as many points in the tail as expected from the data
+        n_tail = rng.binomial(len(data), fit['n_tail'] / len(data))
+        synthetic = sample_power_law(fit['xmin'], fit['alpha'], n_tail, rng)
+        if len(below):
+            synthetic = np.concatenate([synthetic, rng.choice(below, len(data) - n_tail)])
+        distances.append(fit_power_law(synthetic, max_xmin)['ks'])
+    return distances
+
+
+def bootstrap_p(data, fit, samples, pool=None, seed=None, max_xmin=None):
+    """
+    Goodness of fit p-value of a power-law fit, like bootstrap_p of poweRlaw
+    :param pool: multiprocessing.Pool running the refits, or None to run them in this process
+    :param seed: integer or numpy SeedSequence
+    """
+    data = np.asarray(data)
+    data = data[data >= 1]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(samples)
+    num_tasks = min(samples, BOOTSTRAP_TASKS)
+    tasks = [(data, fit, seeds[i::num_tasks], max_xmin) for i in range(num_tasks)]
+    results = pool.map(_bootstrap_distances, tasks) if pool else map(_bootstrap_distances, tasks)
+    distances = np.concatenate([np.asarray(d) for d in results])
+    return float(np.mean(distances >= fit['ks']))
+
+
+def _lognormal_log_pmf(x, xmin, mean_log, sd_log):
+    """
+    Discretized lognormal as in poweRlaw: P(x) = (F(x + 1) - F(x)) / (1 - F(xmin))
+    """
+    # differences of survival functions, in log space to keep precision in the far tail
+    log_sf = norm.logsf((np.log(x) - mean_log) / sd_log)
+    log_sf_next = norm.logsf((np.log(x + 1) - mean_log) / sd_log)
+    log_norm = norm.logsf((np.log(xmin) - mean_log) / sd_log)
+    return log_sf + np.log1p(-np.exp(log_sf_next - log_sf)) - log_norm
+
+
+def _exponential_log_pmf(x, xmin, rate):
+    """
+    Discretized exponential as in poweRlaw, i.e. a geometric distribution from xmin
+    """
+    return np.log1p(-np.exp(-rate)) - rate * (x - xmin)
+
+
+def compare_alternatives(data, fit):
+    """
+    Vuong's test of the power law against discrete lognormal and exponential fits of the same tail,
+    like compare_distributions of poweRlaw. A positive statistic favors the power law.
+    :return: dict of alternative to (normalized log-likelihood ratio, two-sided p-value)
+    """
+    data = np.asarray(data)
+    tail = data[data >= fit['xmin']].astype(float)
+    xmin = fit['xmin']
+    power_law = -fit['alpha'] * np.log(tail) - np.log(zeta(fit['alpha'], xmin))
+    logs = np.log(tail)
+
+    def lognormal_nll(pars):
+        return -_lognormal_log_pmf(tail, xmin, pars[0], np.exp(pars[1])).sum()
+    start = [logs.mean(), np.log(max(logs.std(), 0.1))]
+    mean_log, log_sd = minimize(lognormal_nll, start, method='Nelder-Mead').x
+    # the rate of the geometric distribution has a closed form estimate
+    rate = np.log1p(1 / max((tail - xmin).mean(), 1e-12))
+    alternatives = {'lognormal': _lognormal_log_pmf(tail, xmin, mean_log, np.exp(log_sd)),
+                    'exponential': _exponential_log_pmf(tail, xmin, rate)}
+    results = {}
+    for name, log_pmf in alternatives.items():
+        ratios = power_law - log_pmf
+        sd = ratios.std()
+        statistic = ratios.sum() / (sd * np.sqrt(len(ratios))) if sd > 0 else 0.0
+        results[name] = (float(statistic), float(erfc(abs(statistic) / np.sqrt(2))))
+    return results
+
+
+def load_quantity(output_dir, quantity, f0=None, mean_min_size=None, seed=None):
+    """
+    :param quantity: a key of QUANTITIES, or 'commit_size' with f0 the equilibrium threshold, see commit_sizes.py
+    :return: numpy array of the values of quantity in output_dir
+    """
+    if quantity == 'commit_size':
+        return commit_sizes(read_commits(output_dir), f0, mean_min_size, np.random.default_rng(seed))
+    file_name, column = QUANTITIES[quantity]
+    with open(path.join(output_dir, file_name)) as data_file:
+        return np.array([int(row[column]) for row in csv.DictReader(data_file)], dtype=np.int64)
+
+
+def find_output_dirs(directories):
+    """
+    :return: the directories, and their subdirectories, that hold simulation results
+    """
+    output_dirs = []
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            if 'methods.csv' in files:
+                output_dirs.append(root)
+    return output_dirs
+
+
+def analyze(output_dirs, quantities, samples=1000, jobs=None, seed=None, f0=None, mean_min_size=None,
+            max_xmin=None):
+    """
+    Fit, test and compare power laws for every quantity of every output directory
+    :param samples: number of bootstrap samples, or 0 to skip the goodness of fit test
+    :return: a dict of FIELDS per (directory, quantity)
+    """
+    rows = []
+    seed_sequence = np.random.SeedSequence(seed)
+    with Pool(jobs) if samples else nullcontext() as pool:
+        for output_dir in output_dirs:
+            for quantity in quantities:
+                data = load_quantity(output_dir, quantity, f0, mean_min_size, seed)
+                data = data[data >= 1]
+                row = {'directory': output_dir, 'quantity': quantity, 'n': len(data), 'bootstrap': samples}
+                if len(np.unique(data)) < 2:
+                    # nothing to fit
+                    rows.append(row)
+                    continue
+                fit = fit_power_law(data, max_xmin)
+                row.update(fit)
+                row['p'] = bootstrap_p(data, fit, samples, pool, seed_sequence.spawn(1)[0], max_xmin) \
+                    if samples else None
+                for name, (statistic, p) in compare_alternatives(data, fit).items():
+                    row[name + '_statistic'] = statistic
+                    row[name + '_p'] = p
+                rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser(description='Fit power laws to the results of simulations')
+    arg_parser.add_argument('directories', nargs='+', help='output directories, searched recursively')
+    arg_parser.add_argument('--quantities', dest='quantities', nargs='+', default=list(QUANTITIES),
+                            choices=list(QUANTITIES) + ['commit_size'], help='distributions to fit')
+    arg_parser.add_argument('--f0', dest='f0', type=float, default=None,
+                            help='equilibrium threshold of the commit sizes, which are fitted too if given')
+    arg_parser.add_argument('--mean-min-size', dest='mean_min_size', type=float, default=None,
+                            help='mean log of the minimum commit size, see commit_sizes.py')
+    arg_parser.add_argument('--bootstrap', dest='samples', type=int, default=1000,
+                            help='number of bootstrap samples of the goodness of fit test (0 to skip it)')
+    arg_parser.add_argument('--max-xmin', dest='max_xmin', type=int, default=None,
+                            help='largest xmin considered')
+    arg_parser.add_argument('--jobs', dest='jobs', type=int, default=None,
+                            help='number of worker processes (default: all cores)')
+    arg_parser.add_argument('--seed', dest='seed', type=int, default=None, help='random seed')
+    arg_parser.add_argument('-o', dest='output', type=str, default='power_law.csv', help='output CSV file')
+    options = arg_parser.parse_args(sys.argv[1:])
+    quantities = options.quantities
+    if options.f0 is not None and 'commit_size' not in quantities:
+        quantities = quantities + ['commit_size']
+    results = analyze(find_output_dirs(options.directories), quantities, options.samples, options.jobs,
+                      options.seed, options.f0, options.mean_min_size, options.max_xmin)
+    with open(options.output, 'w', newline='') as output_file:
+        writer = csv.DictWriter(output_file, FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    for row in results:
+        print('%s %s: xmin %s, alpha %s, p %s' % (row['directory'], row['quantity'], row.get('xmin'),
+                                                  row.get('alpha'), row.get('p')))
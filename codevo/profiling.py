@@ -0,0 +1,139 @@
+"""
+Per-operation timing of a simulation run, enabled by simulate.py --profile.
+
+While a run is profiled, the operations below are replaced by wrappers that
+count calls, time them and record the size of their operand, measured before
+the call. Nothing is replaced, or slowed down, when profiling is off.
+"""
+import csv
+import cProfile
+from time import perf_counter
+from functools import wraps
+from contextlib import contextmanager
+
+from codebase import Codebase
+from team import Memory
+
+
+def _callers(codebase, method_name, *args):
+    return codebase.number_of_callers(method_name)
+
+
+# operation -> (class, method name, operand size)
+OPERATIONS = {
+    'add_statement': (Codebase, 'add_statement', lambda codebase, method_name: codebase.size_of(method_name)),
+    'add_method_call': (Codebase, 'add_method_call',
+                        lambda codebase, caller_name, callee_name: codebase.number_of_callers(callee_name)),
+    'delete_method': (Codebase, 'delete_method', _callers),
+    'add_parameter': (Codebase, 'add_parameter', _callers),
+    'move_method': (Codebase, 'move_method', _callers),
+    'rename_method': (Codebase, 'rename_method', _callers),
+    'choose_random_method': (Codebase, 'choose_random_method', lambda codebase: codebase.number_of_methods()),
+    'Memory.occur': (Memory, 'occur', lambda memory: len(memory))
+}
+FIELDS = ['operation', 'calls', 'total_time', 'mean_time', 'max_time', 'mean_size', 'max_size']
+
+
+class _OperationStats:
+    __slots__ = ['calls', 'total_time', 'max_time', 'total_size', 'max_size']
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.total_size = 0
+        self.max_size = 0
+
+
+class OperationProfiler:
+    """
+    Collects per-operation statistics, and optionally a cProfile of the whole
+    run, whose dump can be read by pstats, snakeviz or flameprof.
+    """
+    def __init__(self, cprofile=False):
+        # operation -> _OperationStats
+        self.stats = {operation: _OperationStats() for operation in OPERATIONS}
+        self.simulated_time = 0
+        self.wall_time = 0.0
+        self._cprofile = cProfile.Profile() if cprofile else None
+
+    @contextmanager
+    def instrument(self):
+        """
+        Profile the operations, and time the run, within the context
+        """
+        originals = []
+        for operation, (cls, name, size) in OPERATIONS.items():
+            original = cls.__dict__[name]
+            originals.append((cls, name, original))
+            setattr(cls, name, self._wrap(original, self.stats[operation], size))
+        if self._cprofile:
+            self._cprofile.enable()
+        start = perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall_time += perf_counter() - start
+            if self._cprofile:
+                self._cprofile.disable()
+            for cls, name, original in originals:
+                setattr(cls, name, original)
+
+    @staticmethod
+    def _wrap(function, stats, size):
+        @wraps(function)
+        def wrapper(*args):
+            operand_size = size(*args)
+            start = perf_counter()
+            result = function(*args)
+            elapsed = perf_counter() - start
+            stats.calls += 1
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+            stats.total_size += operand_size
+            if operand_size > stats.max_size:
+                stats.max_size = operand_size
+            return result
+        return wrapper
+
+    def rows(self):
+        """
+        :return: a dict per operation with the FIELDS, most time consuming first
+        """
+        rows = []
+        for operation, stats in self.stats.items():
+            calls = stats.calls
+            rows.append({'operation': operation,
+                         'calls': calls,
+                         'total_time': stats.total_time,
+                         'mean_time': stats.total_time / calls if calls else 0.0,
+                         'max_time': stats.max_time,
+                         'mean_size': stats.total_size / calls if calls else 0.0,
+                         'max_size': stats.max_size})
+        return sorted(rows, key=lambda row: row['total_time'], reverse=True)
+
+    def format_table(self):
+        lines = ['%-22s %10s %10s %7s %10s %10s %10s' %
+                 ('operation', 'calls', 'total s', 'share', 'mean us', 'mean size', 'max size')]
+        for row in self.rows():
+            share = row['total_time'] / self.wall_time if self.wall_time else 0.0
+            lines.append('%-22s %10d %10.3f %6.1f%% %10.2f %10.1f %10d' %
+                         (row['operation'], row['calls'], row['total_time'], share * 100,
+                          row['mean_time'] * 1e6, row['mean_size'], row['max_size']))
+        throughput = self.simulated_time / self.wall_time if self.wall_time else 0.0
+        lines.append('Simulated %d time units in %.2f s (%.1f time units/s)' %
+                     (self.simulated_time, self.wall_time, throughput))
+        return '\n'.join(lines)
+
+    def save(self, file_name):
+        with open(file_name, 'w', newline='') as profile_file:
+            writer = csv.DictWriter(profile_file, FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def dump(self, file_name):
+        """
+        Write the cProfile statistics of the run
+        """
+        self._cprofile.dump_stats(file_name)
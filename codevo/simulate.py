@@ -1,13 +1,138 @@
 import os
 import sys
-import logging
+import csv
 import random
 import simpy
 from time import time
+from contextlib import nullcontext
 from argparse import ArgumentParser
+from multiprocessing import Pool
+from statistics import mean, stdev
 
-from codebase import Codebase
+from codebase import Codebase, parse_initial_classes
+from commit_log import CommitLog
+from snapshots import SnapshotLog
+from events import EventLog
+from checkpoint import save_checkpoint, load_checkpoint, restore
 from team import Manager
+from utils import RandomStreams
+from profiling import OperationProfiler
+
+SUMMARY_FIELDS = ['replicate', 'seed', 'developers', 'methods', 'classes', 'commits', 'wall_time']
+
+
+def prepare_output_dir(output_dir, save_source):
+    if os.path.exists(output_dir):
+        for root, dirs, files in os.walk(output_dir):
+            for name in files:
+                os.remove(os.path.join(root, name))
+    else:
+        os.makedirs(output_dir)
+    if save_source:
+        os.makedirs(os.path.join(output_dir, 'src'), exist_ok=True)
+
+
+def simulate(output_dir, until, seed, save_source=False, forget_threshold=None,
+             commit_format='csv', flush_interval=10000, parameters=None, initial_classes=None,
+             checkpoint_interval=None, resume=None, profiler=None, graph_format='json',
+             snapshot_interval=None, record_events=False):
+    """
+    Run one simulation and save its results in output_dir
+    :param seed: seed of the random streams of the developers, the manager and the codebase,
+    or None to use fresh entropy, which is returned in the summary
+    :param parameters: values overriding team.DEFAULT_PARAMETERS
+    :param initial_classes: pre-parsed initial classes, see codebase.parse_initial_classes
+    :param checkpoint_interval: save output_dir/checkpoint.pkl every checkpoint_interval time units
+    :param resume: checkpoint file to continue from, in which case seed, forget_threshold,
+    parameters and initial_classes are taken from the checkpoint
+    :param profiler: profiling.OperationProfiler collecting statistics of the run
+    :param graph_format: format of the saved graphs, see Codebase.save
+    :param snapshot_interval: record statistics of the codebase every snapshot_interval time units,
+    see snapshots.SnapshotLog
+    :param record_events: write the team size, task queue and commits of the developers over time,
+    see events.EventLog
+    :return: summary of the run
+    """
+    start = time()
+    log_options = {'write_csv': commit_format != 'binary',
+                   'write_binary': commit_format != 'csv',
+                   'flush_interval': flush_interval}
+    if resume:
+        state = load_checkpoint(resume)
+        os.makedirs(output_dir, exist_ok=True)
+        if save_source:
+            os.makedirs(os.path.join(output_dir, 'src'), exist_ok=True)
+        seed = state['seed']
+        m = state['manager']
+        codebase = m.codebase
+        commit_log = CommitLog(output_dir, resume_from=state['commit_log'], **log_options)
+        event_log = EventLog(output_dir, flush_interval, state.get('event_log')) if record_events else None
+        env = restore(state, commit_log, event_log)
+    else:
+        prepare_output_dir(output_dir, save_source)
+        streams = RandomStreams(seed)
+        seed = streams.seed
+        random.seed(seed)
+        env = simpy.Environment()
+        commit_log = CommitLog(output_dir, **log_options)
+        event_log = EventLog(output_dir, flush_interval) if record_events else None
+        codebase = Codebase(commit_log, initial_classes, streams.codebase)
+        m = Manager(env, codebase, forget_threshold, parameters, streams, event_log)
+    start_time = env.now
+    snapshot_log = None
+    if snapshot_interval:
+        snapshot_log = SnapshotLog(output_dir, resume_from=state.get('snapshot_log') if resume else None)
+        if not resume:
+            snapshot_log.record(env.now, m, commit_log)
+    checkpoint_file = os.path.join(output_dir, 'checkpoint.pkl')
+    with commit_log, event_log or nullcontext(), snapshot_log or nullcontext(), profiler.instrument() if profiler else nullcontext():
+        while True:
+            # stop at the next snapshot or checkpoint, or at the end
+            stop = min([until] + [(env.now // interval + 1) * interval
+                                  for interval in [snapshot_interval, checkpoint_interval] if interval])
+            if env.now < until:
+                env.run(until=stop)
+                if snapshot_interval and env.now % snapshot_interval == 0:
+                    snapshot_log.record(env.now, m, commit_log)
+            if checkpoint_interval and (env.now % checkpoint_interval == 0 or env.now >= until):
+                save_checkpoint(checkpoint_file, env, m, commit_log, seed, snapshot_log, event_log)
+            if env.now >= until:
+                break
+    if profiler:
+        profiler.simulated_time += env.now - start_time
+    codebase.save(output_dir, save_source, graph_format)
+    return {'seed': seed,
+            'developers': len(m.developers),
+            'methods': codebase.number_of_methods(),
+            'classes': codebase.number_of_classes(),
+            'commits': commit_log.count,
+            'wall_time': time() - start}
+
+
+def _simulate_replicate(args):
+    replicate, kwargs = args
+    summary = simulate(**kwargs)
+    summary['replicate'] = replicate
+    return summary
+
+
+def simulate_replicates(output_dir, replicates, jobs, seed, **kwargs):
+    """
+    Run independent replicates in a process pool. Replicate i uses seed + i and
+    saves its results in output_dir/replicate<i>.
+    :return: summaries of the replicates
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(i, dict(kwargs, output_dir=os.path.join(output_dir, 'replicate%d' % i), seed=seed + i))
+             for i in range(replicates)]
+    with Pool(jobs) as pool:
+        summaries = pool.map(_simulate_replicate, tasks, chunksize=1)
+    with open(os.path.join(output_dir, 'summary.csv'), 'w', newline='') as summary_file:
+        writer = csv.DictWriter(summary_file, SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    return summaries
+
 
 if __name__ == '__main__':
     arg_parser = ArgumentParser(description='Run the simulation')
@@ -15,22 +140,69 @@ if __name__ == '__main__':
     arg_parser.add_argument('time', metavar='N', type=int, help='simulation time')
     arg_parser.add_argument('-s', dest='save_source', action='store_true',
                             help='whether to save the Java source code')
+    arg_parser.add_argument('--forget-threshold', dest='forget_threshold', type=float, default=None,
+                            help='forget methods whose memory retention falls below this value')
+    arg_parser.add_argument('--commit-format', dest='commit_format', choices=['csv', 'binary', 'both'],
+                            default='csv', help='format of the commit log')
+    arg_parser.add_argument('--graph-format', dest='graph_format', choices=['json', 'columnar', 'both'],
+                            default='json', help='format of the saved method and class graphs')
+    arg_parser.add_argument('--flush-interval', dest='flush_interval', type=int, default=10000,
+                            help='number of commits buffered before writing them out')
+    arg_parser.add_argument('--replicates', dest='replicates', type=int, default=1,
+                            help='number of independent runs, each saved in its own subdirectory')
+    arg_parser.add_argument('--jobs', dest='jobs', type=int, default=None,
+                            help='number of worker processes for replicates (default: all cores)')
+    arg_parser.add_argument('--seed', dest='seed', type=int, default=None,
+                            help='random seed (default: fresh entropy, which is printed)')
+    arg_parser.add_argument('--seed-source', dest='seed_source', type=str, default=None,
+                            help='Java file or directory of Java sources to start from (default: App.java)')
+    arg_parser.add_argument('--profile', dest='profile', action='store_true',
+                            help='time the operations on the codebase and save them in profile.csv')
+    arg_parser.add_argument('--profile-dump', dest='profile_dump', type=str, default=None,
+                            help='also write cProfile statistics of the run to this file (implies --profile)')
+    arg_parser.add_argument('--checkpoint-interval', dest='checkpoint_interval', type=int, default=None,
+                            help='save a checkpoint in the output directory every N time units')
+    arg_parser.add_argument('--snapshot-interval', dest='snapshot_interval', type=int, default=None,
+                            help='record statistics of the codebase every N time units')
+    arg_parser.add_argument('--events', dest='record_events', action='store_true',
+                            help='write the team size, task queue and commits of each developer over time')
+    arg_parser.add_argument('--resume', dest='resume', type=str, default=None,
+                            help='checkpoint file to continue the simulation from')
     options = arg_parser.parse_args(sys.argv[1:])
-    if os.path.exists(options.output_dir):
-        for root, dirs, files in os.walk(options.output_dir):
-            for name in files:
-                os.remove(os.path.join(root, name))
+    if (options.profile or options.profile_dump) and options.replicates > 1 and not options.resume:
+        arg_parser.error('--profile and --profile-dump profile a single run and cannot be used with --replicates')
+    random_seed = options.seed if options.seed is not None else RandomStreams().seed
+    if not options.resume:
+        print('Using seed', random_seed)
+    run_options = {'until': options.time,
+                   'save_source': options.save_source,
+                   'forget_threshold': options.forget_threshold,
+                   'commit_format': options.commit_format,
+                   'flush_interval': options.flush_interval,
+                   'graph_format': options.graph_format,
+                   'checkpoint_interval': options.checkpoint_interval,
+                   'snapshot_interval': options.snapshot_interval,
+                   'record_events': options.record_events}
+    if options.seed_source:
+        run_options['initial_classes'] = parse_initial_classes(options.seed_source, options.jobs)
+    profiler = None
+    if options.profile or options.profile_dump:
+        profiler = OperationProfiler(cprofile=options.profile_dump is not None)
+    if options.replicates > 1 and not options.resume:
+        summaries = simulate_replicates(options.output_dir, options.replicates, options.jobs, random_seed,
+                                        **run_options)
+        for field in ['developers', 'methods', 'classes', 'commits', 'wall_time']:
+            values = [s[field] for s in summaries]
+            print('%s: mean %.2f, sd %.2f' % (field, mean(values), stdev(values)))
     else:
-        os.makedirs(options.output_dir)
-    if options.save_source:
-        os.makedirs(os.path.join(options.output_dir, 'src'), exist_ok=True)
-    random_seed = round(time())
-    print('Using seed', random_seed)
-    random.seed(random_seed)
-    # logging.basicConfig(level=logging.INFO)
-    env = simpy.Environment()
-    codebase = Codebase()
-    m = Manager(env, codebase)
-    env.run(until=options.time)
-    print('Number of developers: ', len(m.developers))
-    codebase.save(options.output_dir, options.save_source)
\ No newline at end of file
+        summary = simulate(options.output_dir, seed=None if options.resume else random_seed,
+                           resume=options.resume, profiler=profiler, **run_options)
+        if options.resume:
+            # the seed of the checkpoint
+            print('Using seed', summary['seed'])
+        print('Number of developers: ', summary['developers'])
+        if profiler:
+            print(profiler.format_table())
+            profiler.save(os.path.join(options.output_dir, 'profile.csv'))
+            if options.profile_dump:
+                profiler.dump(options.profile_dump)
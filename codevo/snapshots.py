@@ -0,0 +1,72 @@
+"""
+Statistics of a running simulation, recorded every few time units, so the
+evolution of the codebase can be studied from a single run.
+
+Snapshots are appended to two CSV files as the simulation runs:
+snapshots.csv has a row of summary statistics per snapshot, and
+distributions.csv has the distributions of method and class metrics in long
+format, one row per (time, distribution, value). The statistics are read
+from counts the codebase keeps up to date, so a snapshot doesn't scan the
+graphs, and its cost depends on the number of distinct values only.
+"""
+import csv
+from os import path
+
+from commit_log import open_log_file
+
+SNAPSHOT_FIELDS = ['time', 'developers', 'tasks', 'commits', 'methods', 'classes', 'calls', 'inheritance', 'lines',
+                   'associations', 'mean_ref_count', 'max_ref_count', 'max_subclasses', 'max_class_lines',
+                   'max_degree']
+DISTRIBUTION_FIELDS = ['time', 'distribution', 'value', 'count']
+
+
+class SnapshotLog:
+    """
+    Writes a snapshot of the codebase to output_dir on every call of record.
+    Snapshots are written as they are taken, and read everything from the
+    manager and codebase passed to record, so the log has no state besides
+    its files. With resume_from, as returned by checkpoint(), snapshots.csv
+    and distributions.csv keep the snapshots taken up to the checkpoint, and
+    later ones are appended.
+    """
+    def __init__(self, output_dir, resume_from=None):
+        offsets = resume_from['offsets'] if resume_from else {}
+        self._files = []
+        self._snapshot_writer = self._open(output_dir, 'snapshots.csv', offsets, SNAPSHOT_FIELDS)
+        self._distribution_writer = self._open(output_dir, 'distributions.csv', offsets, DISTRIBUTION_FIELDS)
+
+    def _open(self, output_dir, name, offsets, fields):
+        log_file = open_log_file(output_dir, name, offsets, newline='')
+        self._files.append(log_file)
+        writer = csv.writer(log_file)
+        if log_file.tell() == 0:
+            writer.writerow(fields)
+        return writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, time, manager, commit_log):
+        codebase = manager.codebase
+        snapshot = codebase.statistics()
+        snapshot.update(time=time, developers=len(manager.developers), tasks=manager.tasks,
+                        commits=commit_log.count)
+        self._snapshot_writer.writerow([snapshot[field] for field in SNAPSHOT_FIELDS])
+        for distribution, counts in codebase.distributions().items():
+            self._distribution_writer.writerows((time, distribution, value, count) for value, count in counts)
+
+    def checkpoint(self):
+        """
+        :return: state to pass as resume_from when continuing this log
+        """
+        for f in self._files:
+            f.flush()
+        return {'offsets': {path.basename(f.name): f.tell() for f in self._files}}
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._files = []
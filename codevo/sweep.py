@@ -0,0 +1,127 @@
+"""
+Run the simulation over a design of Developer and Manager parameters.
+
+The design is read from a JSON file like:
+
+    {
+        "time": 20000,
+        "replicates": 2,
+        "seed": 1,
+        "design": "grid",
+        "parameters": {"p_rename": [0.2, 0.4], "max_tasks": [5, 10, 20]}
+    }
+
+With "design": "grid", every combination of the listed values is run. With
+"design": "random", "samples" combinations are drawn uniformly between the two
+bounds given for each parameter (integers if both bounds are integers).
+Parameter names are the keys of team.DEFAULT_PARAMETERS. An optional
+"seed_source" gives a Java file or directory of Java sources to start from.
+"""
+import os
+import sys
+import csv
+import json
+import random
+from itertools import product
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+from codebase import parse_initial_classes
+from simulate import simulate, SUMMARY_FIELDS
+from team import DEFAULT_PARAMETERS
+
+# the initial classes, parsed once and shared by the runs in a worker process
+_initial_classes = None
+
+
+def grid_design(parameters):
+    names = sorted(parameters)
+    return [dict(zip(names, values)) for values in product(*(parameters[name] for name in names))]
+
+
+def random_design(parameters, samples, rng):
+    design = []
+    for _ in range(samples):
+        point = {}
+        for name in sorted(parameters):
+            low, high = parameters[name]
+            if isinstance(low, int) and isinstance(high, int):
+                point[name] = rng.randint(low, high)
+            else:
+                point[name] = rng.uniform(low, high)
+        design.append(point)
+    return design
+
+
+def create_design(config):
+    parameters = config['parameters']
+    unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError('Unknown parameters: %s' % ', '.join(sorted(unknown)))
+    design = config.get('design', 'grid')
+    if design == 'grid':
+        return grid_design(parameters)
+    elif design == 'random':
+        return random_design(parameters, config['samples'], random.Random(config.get('seed', 0)))
+    else:
+        raise ValueError('Unknown design: %s' % design)
+
+
+def _init_worker(initial_classes):
+    global _initial_classes
+    _initial_classes = initial_classes
+
+
+def _run(args):
+    run, replicate, kwargs = args
+    summary = simulate(initial_classes=_initial_classes, **kwargs)
+    summary.update(run=run, replicate=replicate)
+    summary.update(kwargs['parameters'])
+    return summary
+
+
+def sweep(config, output_dir, jobs=None):
+    """
+    Run every point of the design in a process pool and write results.csv in output_dir
+    :return: summaries of the runs
+    """
+    design = create_design(config)
+    replicates = config.get('replicates', 1)
+    seed = config.get('seed', 0)
+    tasks = []
+    for run, parameters in enumerate(design):
+        for replicate in range(replicates):
+            tasks.append((run, replicate, {
+                'output_dir': os.path.join(output_dir, 'run%d' % run, 'replicate%d' % replicate),
+                'until': config['time'],
+                'seed': seed + len(tasks),
+                'forget_threshold': config.get('forget_threshold'),
+                'commit_format': config.get('commit_format', 'csv'),
+                'graph_format': config.get('graph_format', 'json'),
+                'parameters': parameters
+            }))
+    os.makedirs(output_dir, exist_ok=True)
+    if 'seed_source' in config:
+        initial_classes = parse_initial_classes(config['seed_source'], jobs)
+    else:
+        initial_classes = parse_initial_classes()
+    with Pool(jobs, initializer=_init_worker, initargs=(initial_classes,)) as pool:
+        summaries = pool.map(_run, tasks, chunksize=1)
+    with open(os.path.join(output_dir, 'results.csv'), 'w', newline='') as results_file:
+        writer = csv.DictWriter(results_file, ['run'] + sorted(config['parameters']) + SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    return summaries
+
+
+if __name__ == '__main__':
+    arg_parser = ArgumentParser(description='Run the simulation over a parameter design')
+    arg_parser.add_argument('config', type=str, help='JSON file describing the design')
+    arg_parser.add_argument('-o', dest='output_dir', type=str, default='sweep', help='output directory')
+    arg_parser.add_argument('--jobs', dest='jobs', type=int, default=None,
+                            help='number of worker processes (default: all cores)')
+    options = arg_parser.parse_args(sys.argv[1:])
+    with open(options.config) as config_file:
+        config = json.load(config_file)
+    summaries = sweep(config, options.output_dir, options.jobs)
+    print('Finished', len(summaries), 'runs')
@@ -1,143 +1,232 @@
-import logging
 from random import random, lognormvariate
 from math import floor, exp, ceil
+from collections import OrderedDict
+
+from utils import WeightedSampler
+
+# stability of memory in the forgetting curve
+MEMORY_STABILITY = 40
+
+# default behaviour of developers and the manager
+DEFAULT_PARAMETERS = {
+    'p_grow_method': 0.5,
+    'p_create_method': 0.3,
+    'p_create_class': 0.1,
+    'p_has_super': 0.5,
+    # refactorings
+    'p_rename': 0.4,
+    'p_move': 0.5,
+    # task queue
+    'max_tasks': 10,
+    'task_time': 20,
+    'recruit_time': 20,
+    'task_size_mu': 2,
+    'task_size_sigma': 1
+}
 
-from scipy import stats
-import numpy as np
 
 class Developer:
-    def __init__(self, manager):
+    def __init__(self, manager, index=0):
+        """
+        :param index: position of the developer in the team, in the order they joined
+        """
         self._env = manager.env
         self._manager = manager
-        self._memory = Memory(self._env)
+        self._index = index
+        rng = manager.streams.developer() if manager.streams is not None else None
+        self._random = rng.random if rng is not None else random
+        self._memory = Memory(self._env, manager.forget_threshold, rng)
         self._codebase = manager.codebase
-        self._p_grow_method = 0.5
-        self._p_create_method = 0.3
-        self._p_create_class = 0.1
-        self._p_has_super = 0.5
+        parameters = manager.parameters
+        self._p_grow_method = parameters['p_grow_method']
+        self._p_create_method = parameters['p_create_method']
+        self._p_create_class = parameters['p_create_class']
+        self._p_has_super = parameters['p_has_super']
         # refactorings
-        self._p_rename = 0.4
-        self._p_move = 0.5
+        self._p_rename = parameters['p_rename']
+        self._p_move = parameters['p_move']
+
+        # the current task: steps left, the method being worked on, and the size of changes so far
+        self._task_steps = 0
+        self._method_name = None
+        self._change_size = 0
+        # the action to take after reading: (name, arguments...)
+        self._action = None
+
+        self._process = self._env.process(self.work())
 
-        self._env.process(self.work())
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_env'], state['_process']
+        return state
 
-    def work(self):
+    def resume(self, env, delay):
+        """
+        Continue working in env after being restored from a checkpoint
+        :param delay: time left before the pending action
+        """
+        self._env = env
+        self._memory.resume(env)
+        self._process = env.process(self.work(delay))
+
+    def work(self, delay=None):
+        """
+        Read the code relevant to the next action, then take it
+        :param delay: time left on the pending action, when resuming from a checkpoint
+        """
+        if delay is not None:
+            yield self._env.timeout(delay)
+            self._act()
         while True:
-            change_size = 0
+            yield self._env.timeout(self._plan())
+            self._act()
+
+    def _plan(self):
+        """
+        Choose the next action
+        :return: the time needed to read the relevant code
+        """
+        if self._task_steps == 0:
+            self._change_size = 0
             if self._manager.has_more_tasks():
                 # developing new features
-                task_size = self._manager.assign_task()
-                method_name = self._codebase.choose_random_method()
-                for i in range(task_size):
-                    # inspect the method
-                    yield self._env.timeout(self.get_reading_time(method_name))
-                    if not self._codebase.has_method(method_name):
-                        # The method may be deleted or rename during reading time
-                        method_name = self._codebase.choose_random_method()
-                        continue
-                    if random() < self._p_grow_method:
-                        change_size += self._codebase.add_statement(method_name)
-                    else:
-                        # make a method call
-                        if random() < self._p_create_method:
-                            # create a new method
-                            if random() < self._p_create_class:
-                                # create a new class for the method
-                                superclass_name = None
-                                if not self._memory.is_empty() and random() < self._p_has_super:
-                                    # has a super class
-                                    method_name = self._memory.occur()
-                                    while method_name and not self._codebase.has_method(method_name):
-                                        self._memory.delete(method_name)
-                                        method_name = self._memory.occur()
-                                    if method_name:
-                                        superclass_name = self._codebase.get_class_name(method_name)
-                                c, class_name = self._codebase.create_class(superclass_name)
-                                change_size += c
-                            else:
-                                # choose from an existing class
-                                class_name = self._codebase.choose_random_class()
-                            c, callee_name = self._codebase.create_method(class_name)
-                            change_size += c
-                            self._memory.add(callee_name)
-                        else:
-                            # call an existing method
-                            if self._memory.is_empty():
-                                callee_name = self._codebase.choose_random_method()
-                            else:
-                                callee_name = self._memory.occur()
-                            # if random() > 0.5:
-                            #     # Evolve the existing method
-                            #     change_size += self._codebase.add_parameter(callee_name)
-                        change_size += self._codebase.add_method_call(method_name, callee_name)
-                    self._memory.add(method_name)
-                    # walk to a neighbor
-                    method_name = self._codebase.choose_random_neighbor(method_name)
-                    if method_name is None:
-                        method_name = self._codebase.choose_random_method()
+                self._task_steps = self._manager.assign_task()
+                self._method_name = self._codebase.choose_random_method()
             else:
-                # refactoring
-                n = random()
-                if self._codebase.number_of_methods() == 1 or n < self._p_rename:
-                    unfit_method_name = self._codebase.least_fit_methods()[0]
-                    yield self._env.timeout(self.get_reading_time(unfit_method_name))
-                    # rename a method, don't need to understand callers
-                    if not self._codebase.has_method(unfit_method_name):
-                        continue
-                    c, new_method_name = self._codebase.rename_method(unfit_method_name)
-                    change_size += c
-                    if self._memory.has(unfit_method_name):
-                        self._memory.rename(unfit_method_name, new_method_name)
-                    self._memory.add(new_method_name)
-                elif self._codebase.number_of_classes() == 1 or n > self._p_rename + self._p_move:
-                    # merge two methods
-                    delete_method_name, update_method_name = self._codebase.least_fit_methods(2)
-                    # Understanding the relevant methods
-                    reading_time = self.get_reading_time(delete_method_name) + self.get_reading_time(update_method_name)
-                    for method_name in self._codebase.caller_names(delete_method_name):
-                        reading_time += self.get_reading_time(method_name)
-                    for method_name in self._codebase.caller_names(update_method_name):
-                        reading_time += self.get_reading_time(method_name)
-                    yield self._env.timeout(reading_time)
-                    # Examine if the methods still exist
-                    if not self._codebase.has_method(delete_method_name) or \
-                            not self._codebase.has_method(update_method_name):
-                        continue
-                    # Delete the method
-                    caller_names = [n for n in self._codebase.caller_names(delete_method_name)
-                                    if n != delete_method_name]
-                    change_size += self._codebase.delete_method(delete_method_name)
-                    self._memory.delete(delete_method_name)
-                    # Add a parameter to another method
-                    change_size += self._codebase.add_parameter(update_method_name)
-                    self._memory.add(update_method_name)
-                    for method_name in self._codebase.caller_names(update_method_name):
-                        self._memory.add(method_name)
-                    # Make the callers of the former method call the latter method
-                    for method_name in caller_names:
-                        # treat them as updating method calls, so the change size doesn't increase here
-                        self._codebase.add_method_call(method_name, update_method_name)
-                        self._memory.add(method_name)
+                return self._plan_refactoring()
+        # inspect the method
+        self._action = ('develop',)
+        return self.get_reading_time(self._method_name)
+
+    def _plan_refactoring(self):
+        n = self._random()
+        if self._codebase.number_of_methods() == 1 or n < self._p_rename:
+            unfit_method_name = self._codebase.least_fit_methods()[0]
+            self._action = ('rename', unfit_method_name)
+            return self.get_reading_time(unfit_method_name)
+        elif self._codebase.number_of_classes() == 1 or n > self._p_rename + self._p_move:
+            delete_method_name, update_method_name = self._codebase.least_fit_methods(2)
+            # Understanding the relevant methods
+            reading_time = self.get_reading_time(delete_method_name) + self.get_reading_time(update_method_name)
+            for method_name in self._codebase.caller_names(delete_method_name):
+                reading_time += self.get_reading_time(method_name)
+            for method_name in self._codebase.caller_names(update_method_name):
+                reading_time += self.get_reading_time(method_name)
+            self._action = ('merge', delete_method_name, update_method_name)
+            return reading_time
+        else:
+            unfit_method_name = self._codebase.least_fit_methods()[0]
+            self._action = ('move', unfit_method_name)
+            return self.get_reading_time(unfit_method_name)
+
+    def _act(self):
+        name, arguments = self._action[0], self._action[1:]
+        getattr(self, '_' + name)(*arguments)
+        if self._task_steps == 0 and self._change_size > 0:
+            self._codebase.commit(self._change_size)
+            if self._manager.events is not None:
+                self._manager.events.commit(self._env.now, self._index, self._change_size)
+
+    def _develop(self):
+        self._task_steps -= 1
+        method_name = self._method_name
+        if not self._codebase.has_method(method_name):
+            # The method may be deleted or rename during reading time
+            self._method_name = self._codebase.choose_random_method()
+            return
+        if self._random() < self._p_grow_method:
+            self._change_size += self._codebase.add_statement(method_name)
+        else:
+            # make a method call
+            if self._random() < self._p_create_method:
+                # create a new method
+                if self._random() < self._p_create_class:
+                    # create a new class for the method
+                    superclass_name = None
+                    if not self._memory.is_empty() and self._random() < self._p_has_super:
+                        # has a super class
+                        super_method_name = self._memory.occur()
+                        while super_method_name and not self._codebase.has_method(super_method_name):
+                            self._memory.delete(super_method_name)
+                            super_method_name = self._memory.occur()
+                        if super_method_name:
+                            superclass_name = self._codebase.get_class_name(super_method_name)
+                    c, class_name = self._codebase.create_class(superclass_name)
+                    self._change_size += c
                 else:
-                    unfit_method_name = self._codebase.least_fit_methods()[0]
-                    yield self._env.timeout(self.get_reading_time(unfit_method_name))
-                    # move a method closer to its callers, don't need to understand callers
-                    if not self._codebase.has_method(unfit_method_name):
-                        continue
-                    class_name = self._codebase.get_class_name(unfit_method_name)
-                    # initialize the original class name to 0.5 to break tie
-                    reference_counts = {class_name: 0.5}
-                    for method_name in self._codebase.caller_names(unfit_method_name):
-                        class_name = self._codebase.get_class_name(method_name)
-                        if class_name in reference_counts:
-                            reference_counts[class_name] += 1
-                        else:
-                            reference_counts[class_name] = 1
-                    closest_class_name = max(reference_counts, key=lambda c: reference_counts[c])
-                    change_size += self._codebase.move_method(unfit_method_name, closest_class_name)
-                    self._memory.add(unfit_method_name)
-            if change_size > 0:
-                self._codebase.commit(change_size)
+                    # choose from an existing class
+                    class_name = self._codebase.choose_random_class()
+                c, callee_name = self._codebase.create_method(class_name)
+                self._change_size += c
+                self._memory.add(callee_name)
+            else:
+                # call an existing method
+                callee_name = self._memory.occur()
+                while callee_name and not self._codebase.has_method(callee_name):
+                    # the method may be deleted by other developers
+                    self._memory.delete(callee_name)
+                    callee_name = self._memory.occur()
+                if callee_name is None:
+                    callee_name = self._codebase.choose_random_method()
+                # if random() > 0.5:
+                #     # Evolve the existing method
+                #     change_size += self._codebase.add_parameter(callee_name)
+            self._change_size += self._codebase.add_method_call(method_name, callee_name)
+        self._memory.add(method_name)
+        # walk to a neighbor
+        self._method_name = self._codebase.choose_random_neighbor(method_name)
+        if self._method_name is None:
+            self._method_name = self._codebase.choose_random_method()
+
+    def _rename(self, unfit_method_name):
+        # rename a method, don't need to understand callers
+        if not self._codebase.has_method(unfit_method_name):
+            return
+        c, new_method_name = self._codebase.rename_method(unfit_method_name)
+        self._change_size += c
+        if self._memory.has(unfit_method_name):
+            self._memory.rename(unfit_method_name, new_method_name)
+        self._memory.add(new_method_name)
+
+    def _merge(self, delete_method_name, update_method_name):
+        # Examine if the methods still exist
+        if not self._codebase.has_method(delete_method_name) or \
+                not self._codebase.has_method(update_method_name) or \
+                not self._codebase.is_deletable(delete_method_name):
+            return
+        # Delete the method
+        caller_names = [n for n in self._codebase.caller_names(delete_method_name)
+                        if n != delete_method_name]
+        self._change_size += self._codebase.delete_method(delete_method_name)
+        if self._memory.has(delete_method_name):
+            self._memory.delete(delete_method_name)
+        # Add a parameter to another method
+        self._change_size += self._codebase.add_parameter(update_method_name)
+        self._memory.add(update_method_name)
+        for method_name in self._codebase.caller_names(update_method_name):
+            self._memory.add(method_name)
+        # Make the callers of the former method call the latter method
+        for method_name in caller_names:
+            # treat them as updating method calls, so the change size doesn't increase here
+            self._codebase.add_method_call(method_name, update_method_name)
+            self._memory.add(method_name)
+
+    def _move(self, unfit_method_name):
+        # move a method closer to its callers, don't need to understand callers
+        if not self._codebase.has_method(unfit_method_name):
+            return
+        class_name = self._codebase.get_class_name(unfit_method_name)
+        # initialize the original class name to 0.5 to break tie
+        reference_counts = {class_name: 0.5}
+        for method_name in self._codebase.caller_names(unfit_method_name):
+            class_name = self._codebase.get_class_name(method_name)
+            if class_name in reference_counts:
+                reference_counts[class_name] += 1
+            else:
+                reference_counts[class_name] = 1
+        closest_class_name = max(reference_counts, key=lambda c: reference_counts[c])
+        self._change_size += self._codebase.move_method(unfit_method_name, closest_class_name)
+        self._memory.add(unfit_method_name)
 
     def get_reading_time(self, method_name):
         """
@@ -149,44 +238,63 @@ class Developer:
         if self._memory.has(method_name):
             # Forgetting curve: https://en.wikipedia.org/wiki/Forgetting_curve
             t = self._memory.last_time(method_name)
-            reading_time *= 1 - exp(-t/40)
+            reading_time *= 1 - exp(-t/MEMORY_STABILITY)
         return reading_time + 1
 
 class Memory:
-    def __init__(self, env):
-        self._storage = {}
+    """
+    Items a developer has seen, with the number of times each item occurred
+    and the last time it was seen.
+
+    If forget_threshold is given, items whose retention on the forgetting curve,
+    exp(-elapsed/MEMORY_STABILITY), has fallen below it are forgotten.
+    """
+    def __init__(self, env, forget_threshold=None, rng=None):
+        # last seen time of items, least recently seen first
+        self._storage = OrderedDict()
+        # items weighted by the number of times they occurred
+        self._occurrences = WeightedSampler(rng)
+        self._env = env
+        self._forget_threshold = forget_threshold
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_env']
+        return state
+
+    def resume(self, env):
         self._env = env
 
     def add(self, item):
         if item not in self._storage:
-            self._storage[item] = []
-        self._storage[item].append(self._env.now)
+            self._occurrences.add(item, 1)
+        else:
+            self._occurrences.increase(item)
+            self._storage.move_to_end(item)
+        self._storage[item] = self._env.now
+        self._forget()
 
     def delete(self, item):
         del self._storage[item]
+        self._occurrences.remove(item)
 
     def rename(self, old_name, new_name):
-        self._storage[new_name] = self._storage[old_name]
-        self.delete(old_name)
+        self._storage[new_name] = self._storage.pop(old_name)
+        self._occurrences.rename(old_name, new_name)
 
     def last_time(self, item):
-        if item in self._storage:
-            return self._storage[item][-1]
-        else:
-            return None
+        return self._storage.get(item)
 
     def occur(self):
-        items = list(self._storage.keys())
-        length = len(items)
-        if length == 0:
-            return None
-        elif length == 1:
-            return items[0]
-        weights = [len(i) for i in items]
-        s = sum(weights)
-        probs = [w / s for w in weights]
-        dist = stats.rv_discrete(values=(range(length), probs))
-        return items[dist.rvs()]
+        """
+        Recall a random item, weighted by the number of times it occurred
+        :return: the item, or None if the memory is empty
+        """
+        self._forget()
+        return self._occurrences.sample()
+
+    def __len__(self):
+        return len(self._storage)
 
     def is_empty(self):
         return len(self._storage) == 0
@@ -194,34 +302,101 @@ class Memory:
     def has(self, item):
         return item in self._storage
 
+    def _forget(self):
+        if self._forget_threshold is None:
+            return
+        while self._storage:
+            item, last_time = next(iter(self._storage.items()))
+            if exp(-(self._env.now - last_time) / MEMORY_STABILITY) >= self._forget_threshold:
+                break
+            self.delete(item)
+
 
 class Manager:
-    def __init__(self, env, codebase):
+    def __init__(self, env, codebase, forget_threshold=None, parameters=None, streams=None, events=None):
+        """
+        :param parameters: values overriding DEFAULT_PARAMETERS
+        :param streams: utils.RandomStreams of the manager and developers, or None for the global random module
+        :param events: events.EventLog receiving the events of the team, or None to discard them
+        """
         self.env = env
+        self.streams = streams
+        self.events = events
+        self._lognormvariate = streams.manager.lognormvariate if streams is not None else lognormvariate
         self.tasks = 0
         self.codebase = codebase
-        env.process(self.work())
-        self.developers = [Developer(self)]
+        self.forget_threshold = forget_threshold
+        self.parameters = dict(DEFAULT_PARAMETERS)
+        if parameters:
+            unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+            if unknown:
+                raise ValueError('Unknown parameters: %s' % ', '.join(sorted(unknown)))
+            self.parameters.update(parameters)
+        # the action to take after the current timeout
+        self._action = None
+        self._process = env.process(self.work())
+        self.developers = []
+        self._recruit()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['env'], state['_process']
+        state['events'] = None
+        return state
+
+    def set_event_log(self, events):
+        """
+        Send the following events to events, e.g. after restoring from a checkpoint
+        """
+        self.events = events
+
+    def resume(self, env, delay):
+        """
+        Continue managing in env after being restored from a checkpoint
+        :param delay: time left before the pending action
+        """
+        self.env = env
+        self._process = env.process(self.work(delay))
 
     def has_more_tasks(self):
         return self.tasks > 0
 
     def assign_task(self):
         self.tasks -= 1
-        logging.info('Task assigned, queue size: %d' % self.tasks)
-        return ceil(lognormvariate(2, 1))
+        if self.events is not None:
+            self.events.task_assigned(self.env.now, self.tasks)
+        return ceil(self._lognormvariate(self.parameters['task_size_mu'], self.parameters['task_size_sigma']))
 
-    def work(self):
+    def work(self, delay=None):
+        """
+        :param delay: time left on the pending action, when resuming from a checkpoint
+        """
+        if delay is not None:
+            yield self.env.timeout(delay)
+            self._act()
         while True:
-            if self.tasks < 10:
-                # thinking out new task
-                logging.info('%d: Creating new task...' % self.env.now)
-                yield self.env.timeout(20)
-                self.tasks += 1
-                logging.info('Task created, queue size: %d' % self.tasks)
-            else:
-                # recruiting new developer
-                logging.info('%d: Recruiting new developer' % self.env.now)
-                yield self.env.timeout(20)
-                self.developers.append(Developer(self))
-                logging.info('Developer joined, team size: %d' % len(self.developers))
+            yield self.env.timeout(self._plan())
+            self._act()
+
+    def _plan(self):
+        if self.tasks < self.parameters['max_tasks']:
+            # thinking out new task
+            self._action = 'create_task'
+            return self.parameters['task_time']
+        else:
+            # recruiting new developer
+            self._action = 'recruit'
+            return self.parameters['recruit_time']
+
+    def _act(self):
+        if self._action == 'create_task':
+            self.tasks += 1
+            if self.events is not None:
+                self.events.task_created(self.env.now, self.tasks)
+        else:
+            self._recruit()
+
+    def _recruit(self):
+        self.developers.append(Developer(self, len(self.developers)))
+        if self.events is not None:
+            self.events.developer_joined(self.env.now, len(self.developers))
@@ -1,10 +1,323 @@
 __author__ = 'lzp'
 
+import gc
+from random import random, Random
+from heapq import heappush, heappop
+from contextlib import contextmanager
+
 import numpy as np
-from random import random
 
 
-def sample(weighted_values):
-    bins = np.add.accumulate([weight for value, weight in weighted_values])
-    selected_index = np.digitize([random() * bins[-1]], bins)
-    return weighted_values[int(selected_index)][0]
+class WeightedSampler:
+    """
+    Weighted random sampling over a changing set of items.
+
+    Weights are kept in a Fenwick (binary indexed) tree, so adding, removing
+    or re-weighting an item and drawing a sample are all O(log n). Each item
+    occupies a slot in the tree; slots of removed items are recycled.
+
+    Samples are drawn with rng.random(), or with the global random module if
+    rng is None.
+    """
+    def __init__(self, rng=None):
+        self._random = rng.random if rng is not None else None
+        self._slots = {}
+        self._items = []
+        self._weights = []
+        self._tree = [0]
+        self._free = []
+        self._total = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, item):
+        return item in self._slots
+
+    def total(self):
+        return self._total
+
+    def weight(self, item):
+        return self._weights[self._slots[item]]
+
+    def add(self, item, weight):
+        """
+        Add a new item with the given weight
+        """
+        if self._free:
+            slot = self._free.pop()
+            self._items[slot] = item
+        else:
+            slot = len(self._items)
+            self._items.append(item)
+            self._weights.append(0)
+            self._grow()
+        self._slots[item] = slot
+        self._update(slot, weight)
+
+    def set(self, item, weight):
+        self._update(self._slots[item], weight - self._weights[self._slots[item]])
+
+    def increase(self, item, delta=1):
+        self._update(self._slots[item], delta)
+
+    def remove(self, item):
+        slot = self._slots.pop(item)
+        self._update(slot, -self._weights[slot])
+        self._items[slot] = None
+        self._free.append(slot)
+
+    def rename(self, old_item, new_item):
+        slot = self._slots.pop(old_item)
+        self._slots[new_item] = slot
+        self._items[slot] = new_item
+
+    def sample(self):
+        """
+        Choose a random item with probability proportional to its weight
+        :return: the item, or None if all weights are zero
+        """
+        if self._total <= 0:
+            return None
+        target = (self._random() if self._random is not None else random()) * self._total
+        # descend the tree to the first slot whose prefix sum exceeds target
+        position = 0
+        step = 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            next_position = position + step
+            if next_position < len(self._tree) and self._tree[next_position] <= target:
+                position = next_position
+                target -= self._tree[next_position]
+            step >>= 1
+        return self._items[min(position, len(self._items) - 1)]
+
+    def _update(self, slot, delta):
+        self._weights[slot] += delta
+        self._total += delta
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _grow(self):
+        # the new node covers the slots (i - lowbit(i), i]
+        i = len(self._tree)
+        node = 0
+        j = i - 1
+        lower = i - (i & -i)
+        while j > lower:
+            node += self._tree[j]
+            j -= j & -j
+        self._tree.append(node + self._weights[i - 1])
+
+
+class IndexedHeap:
+    """
+    Binary min-heap of items keyed by a value, with a position index so that
+    the key of any item can be changed, or the item removed, in O(log n).
+    """
+    def __init__(self):
+        self._heap = []
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def key(self, item):
+        return self._heap[self._positions[item]][0]
+
+    def push(self, item, key):
+        self._heap.append([key, item])
+        self._positions[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, item, key):
+        i = self._positions[item]
+        old_key = self._heap[i][0]
+        self._heap[i][0] = key
+        if key < old_key:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, item):
+        i = self._positions.pop(item)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._positions[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._positions[last[1]])
+
+    def min_key(self):
+        return self._heap[0][0]
+
+    def smallest(self, n=1):
+        """
+        :return: the n items with the smallest keys, in ascending order
+        """
+        result = []
+        # explore the heap from its root, only expanding popped entries
+        frontier = [(self._heap[0][0], 0)] if self._heap else []
+        while frontier and len(result) < n:
+            key, i = heappop(frontier)
+            result.append(self._heap[i][1])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    heappush(frontier, (self._heap[child][0], child))
+        return result
+
+    def _sift_up(self, i):
+        heap = self._heap
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if entry[0] < heap[parent][0]:
+                heap[i] = heap[parent]
+                self._positions[heap[i][1]] = i
+                i = parent
+            else:
+                break
+        heap[i] = entry
+        self._positions[entry[1]] = i
+
+    def _sift_down(self, i):
+        heap = self._heap
+        size = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if heap[child][0] < entry[0]:
+                heap[i] = heap[child]
+                self._positions[heap[i][1]] = i
+                i = child
+            else:
+                break
+        heap[i] = entry
+        self._positions[entry[1]] = i
+
+
+class Histogram:
+    """
+    Number of items having each value, kept up to date as values change, so a
+    distribution can be read without scanning the items.
+    """
+    def __init__(self):
+        self._counts = {}
+
+    def __len__(self):
+        """
+        :return: number of distinct values
+        """
+        return len(self._counts)
+
+    def add(self, value, count=1):
+        counts = self._counts
+        new_count = counts.get(value, 0) + count
+        if new_count:
+            counts[value] = new_count
+        else:
+            del counts[value]
+
+    def remove(self, value):
+        self.add(value, -1)
+
+    def move(self, old_value, new_value):
+        """
+        Record that an item changed from old_value to new_value
+        """
+        if old_value != new_value:
+            self.add(old_value, -1)
+            self.add(new_value)
+
+    def total(self):
+        return sum(self._counts.values())
+
+    def max(self):
+        return max(self._counts) if self._counts else 0
+
+    def items(self):
+        """
+        :return: sorted list of (value, number of items)
+        """
+        return sorted(self._counts.items())
+
+
+class RandomStream(Random):
+    """
+    An independent stream of random numbers, seeded from a numpy SeedSequence.
+
+    Single draws come from the Mersenne Twister of random.Random, which is faster
+    per call than taking numbers one by one from a pre-generated batch in Python.
+    Vectorized code can draw whole batches with uniform_batch, which come from a
+    separate PCG64 generator of the same seed sequence.
+    """
+    def __init__(self, seed_sequence=None):
+        if seed_sequence is None:
+            # unpickling, the state is restored by setstate
+            super(RandomStream, self).__init__()
+            self._generator = None
+            return
+        scalar_seed, batch_seed = seed_sequence.spawn(2)
+        super(RandomStream, self).__init__(int.from_bytes(scalar_seed.generate_state(4).tobytes(), 'little'))
+        self._generator = np.random.Generator(np.random.PCG64(batch_seed))
+
+    def uniform_batch(self, size):
+        """
+        :return: numpy array of size numbers uniformly distributed in [0, 1)
+        """
+        return self._generator.random(size)
+
+    def getstate(self):
+        return super(RandomStream, self).getstate(), self._generator.bit_generator.state
+
+    def setstate(self, state):
+        scalar_state, batch_state = state
+        super(RandomStream, self).setstate(scalar_state)
+        self._generator = np.random.Generator(np.random.PCG64())
+        self._generator.bit_generator.state = batch_state
+
+
+class RandomStreams:
+    """
+    Independent random streams for the components of a simulation, all derived
+    from one seed. Every developer gets its own stream, in order of recruitment.
+    """
+    def __init__(self, seed=None):
+        """
+        :param seed: non-negative integer, or None to use fresh entropy, which is kept in self.seed
+        """
+        seed_sequence = np.random.SeedSequence(seed)
+        self.seed = seed_sequence.entropy
+        manager_seed, codebase_seed, self._developer_seeds = seed_sequence.spawn(3)
+        self.manager = RandomStream(manager_seed)
+        self.codebase = RandomStream(codebase_seed)
+
+    def developer(self):
+        """
+        :return: the stream of a new developer
+        """
+        return RandomStream(self._developer_seeds.spawn(1)[0])
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector while creating many long-lived objects,
+    e.g. large ASTs, which would otherwise trigger repeated full collections.
+    The collector is re-enabled afterwards if it was enabled before.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
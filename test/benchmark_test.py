@@ -0,0 +1,20 @@
+from unittest import TestCase
+from codevo.benchmark import synthetic_codebase, run_benchmarks, compare
+
+
+class BenchmarkTest(TestCase):
+    def test_synthetic_codebase(self):
+        codebase = synthetic_codebase(200)
+        self.assertEqual(200, codebase.number_of_methods())
+        self.assertEqual(20, codebase.number_of_classes())
+        self.assertEqual(list(codebase._method_call_graph.edges()), list(synthetic_codebase(200)._method_call_graph.edges()))
+
+    def test_run_and_compare(self):
+        results = run_benchmarks([100], [(200, {})])
+        names = {r['benchmark'] for r in results}
+        self.assertIn('codebase.delete_method', names)
+        self.assertIn('memory.occur', names)
+        self.assertIn('simulate', names)
+        self.assertEqual([], compare(results, results, 0.2))
+        slower = [dict(r, mean_us=r['mean_us'] * 2 + 1) for r in results]
+        self.assertEqual(len(results), len(compare(results, slower, 0.2)))
@@ -1,14 +1,25 @@
 from unittest import TestCase
+from unittest.mock import Mock, patch
+from tempfile import TemporaryDirectory
+from os import path, makedirs
+from glob import glob
+import csv
+import random
+from collections import Counter
 from codevo import Codebase, JavaPrinter
+from codevo.codebase import parse_initial_classes
+from codevo.columns import load_table
 
 
 class CodebaseTest(TestCase):
     def test_create_statement(self):
         code_modifier = Codebase()
-        stmt = code_modifier.create_variable_declaration()
+        _, class_name = code_modifier.create_class(None)
+        _, method_name = code_modifier.create_method(class_name)
+        code_modifier.add_statement(method_name)
         printer = JavaPrinter()
-        stmt.accept(printer)
-        self.assertEqual('int var0 = 0;\n', printer.result)
+        code_modifier.class_declaration(class_name).body[0].body[0].accept(printer)
+        self.assertEqual('int var2 = 2;\n', printer.result)
 
     def test_delete_reference(self):
         code_modifier = Codebase()
@@ -18,4 +29,377 @@ class CodebaseTest(TestCase):
         code_modifier.add_method_call(method1.name, method2.name)
         self.assertEqual(1, len(method1.body))
         code_modifier.delete_method_call(method1, method2, klass)
-        self.assertEqual(0, len(method1.body))
\ No newline at end of file
+        self.assertEqual(0, len(method1.body))
+
+    def test_sampler_weights_follow_sizes(self):
+        codebase = Codebase()
+        _, class_name = codebase.create_class(None)
+        _, method1 = codebase.create_method(class_name)
+        _, method2 = codebase.create_method(class_name)
+        codebase.add_statement(method1)
+        codebase.add_method_call(method1, method2)
+        codebase.add_method_call(method2, 'run')
+        codebase.move_method(method2, 'App')
+        _, method1 = codebase.rename_method(method1)
+        codebase.delete_method(method2)
+        for method_id in codebase._method_call_graph.ids():
+            self.assertEqual(len(codebase._methods[method_id].body) + 1, codebase._method_sampler.weight(method_id))
+        for class_id in codebase._inheritance_graph.ids():
+            self.assertEqual(len(codebase._classes[class_id].body) + 1, codebase._class_sampler.weight(class_id))
+        self.assertEqual(codebase.number_of_methods(), len(codebase._method_sampler))
+
+    def test_least_fit_methods(self):
+        commit_log = Mock()
+        codebase = Codebase(commit_log)
+        _, class_name = codebase.create_class(None)
+        methods = [codebase.create_method(class_name)[1] for _ in range(5)]
+        codebase.add_method_call(methods[0], methods[1])
+        codebase.rename_method(methods[2])
+        codebase.delete_method(methods[3])
+        graph = codebase._method_call_graph
+        fitness = {name: codebase._fitness[graph.id_of(name)] for name in graph}
+        expected = sorted(fitness, key=fitness.get)
+        self.assertEqual(expected[:2], codebase.least_fit_methods(2))
+        codebase.commit(1)
+        commit_log.append.assert_called_once_with(fitness[expected[0]], 1)
+
+    def test_call_site_index(self):
+        codebase = Codebase()
+        _, class_name = codebase.create_class(None)
+        methods = [codebase.create_method(class_name)[1] for _ in range(4)]
+        codebase.add_statement(methods[0])
+        codebase.add_method_call(methods[0], methods[1])
+        codebase.add_method_call(methods[0], methods[1])
+        codebase.add_method_call(methods[1], methods[1])
+        codebase.add_method_call(methods[2], methods[1])
+        codebase.add_method_call(methods[1], methods[3])
+        codebase.add_parameter(methods[1])
+        _, methods[1] = codebase.rename_method(methods[1])
+        codebase.move_method(methods[1], 'App')
+        invocations = list(codebase.method_invocations(methods[1]))
+        self.assertEqual(4, len(invocations))
+        for inv in invocations:
+            self.assertEqual(methods[1], inv.name)
+            self.assertEqual('App', inv.target.value)
+        # the last local variable, the caller's own parameter, or a literal
+        self.assertEqual(['6', 'param0', 'var5', 'var5'],
+                         sorted(str(inv.arguments[0].value) for inv in invocations))
+        self.assertEqual(1, len(list(codebase.method_invocations(methods[3]))))
+        self.assertEqual(6, codebase.delete_method(methods[1]))
+        self.assertEqual(1, codebase.size_of(methods[0]))
+        self.assertEqual(0, len(list(codebase.method_invocations(methods[3]))))
+
+    def test_class_lines(self):
+        codebase = Codebase()
+        _, class1 = codebase.create_class(None)
+        _, class2 = codebase.create_class(class1)
+        _, method1 = codebase.create_method(class1)
+        _, method2 = codebase.create_method(class2)
+        _, method3 = codebase.create_method(class2)
+        codebase.add_statement(method1)
+        codebase.add_method_call(method1, method2)
+        codebase.add_method_call(method2, method3)
+        codebase.add_method_call(method3, method3)
+        codebase.move_method(method1, class2)
+        codebase.delete_method(method3)
+        for class_name in codebase._inheritance_graph:
+            printer = JavaPrinter()
+            codebase.class_declaration(class_name).accept(printer)
+            self.assertEqual(printer.result.count('\n') + 1,
+                             codebase._class_lines[codebase._inheritance_graph.id_of(class_name)])
+
+    def test_distributions(self):
+        codebase = Codebase()
+        _, class1 = codebase.create_class('App')
+        _, method1 = codebase.create_method(class1)
+        _, method2 = codebase.create_method(class1)
+        codebase.add_statement(method1)
+        codebase.add_method_call(method1, method2)
+        codebase.add_method_call('run', method2)
+        codebase.add_method_call(method2, method2)
+        codebase.add_method_call(method2, method1)
+        codebase.move_method(method2, 'App')
+        codebase.delete_method(method1)
+        method_graph = codebase._method_call_graph
+        class_graph = codebase._inheritance_graph
+        ref_counts = Counter(method_graph.in_degree(i) for i in method_graph.ids())
+        class_lines = Counter(codebase._class_lines[i] for i in class_graph.ids())
+        distributions = codebase.distributions()
+        self.assertEqual(sorted(ref_counts.items()), distributions['ref_count'])
+        self.assertEqual(sorted(class_lines.items()), distributions['class_lines'])
+        # class1 is deleted with its last method
+        self.assertEqual([(0, 1)], distributions['subclasses'])
+        statistics = codebase.statistics()
+        self.assertEqual(sum(codebase._class_lines[i] for i in class_graph.ids()), statistics['lines'])
+        self.assertEqual(max(ref_counts), statistics['max_ref_count'])
+        self.assertEqual(method_graph.number_of_edges(), statistics['calls'])
+
+    def test_associations(self):
+        random.seed(4)
+        codebase = Codebase()
+        classes = ['App']
+        methods = ['run']
+        for _ in range(300):
+            choice = random.random()
+            if choice < 0.1:
+                classes.append(codebase.create_class(random.choice(classes) if random.random() < 0.5 else None)[1])
+            elif choice < 0.3:
+                methods.append(codebase.create_method(random.choice(classes))[1])
+            elif choice < 0.7:
+                codebase.add_method_call(random.choice(methods), random.choice(methods))
+            elif choice < 0.85:
+                codebase.move_method(random.choice(methods), random.choice(classes))
+            elif len(methods) > 1:
+                method = random.choice(methods)
+                codebase.delete_method(method)
+                methods.remove(method)
+                classes = [c for c in classes if c in codebase._inheritance_graph]
+        # recount the associations from the method calls and the inheritance relations
+        weights = Counter()
+        for caller_id, callee_id in codebase._method_call_graph.edges():
+            a, b = codebase._method_classes[caller_id], codebase._method_classes[callee_id]
+            weights[min(a, b), max(a, b)] += len(codebase._call_sites[callee_id][caller_id])
+        for a, b in codebase._inheritance_graph.edges():
+            weights[min(a, b), max(a, b)] += 1
+        self.assertEqual(sorted(weights.items()), sorted(((a, b), w) for a, b, w in codebase._associations.edges()))
+        class_graph = codebase._inheritance_graph
+        for class_name in classes:
+            class_id = class_graph.id_of(class_name)
+            degree = sum(1 + (a == b) for a, b in weights if class_id in (a, b))
+            self.assertEqual(degree, codebase.class_degree(class_name))
+        a, b = next(iter(weights))
+        self.assertEqual(weights[a, b], codebase.coupling(class_graph.name_of(b), class_graph.name_of(a)))
+        degrees = Counter(codebase.class_degree(c) for c in classes)
+        self.assertEqual(sorted(degrees.items()), codebase.distributions()['degree'])
+
+    def test_initial_classes_cache(self):
+        with TemporaryDirectory() as cache_dir:
+            java_file_name = path.join(cache_dir, 'App.java')
+            with open(java_file_name, 'w') as java_file:
+                java_file.write('public class App { void run() {} }')
+            classes = parse_initial_classes(java_file_name, cache_dir=cache_dir)
+            self.assertEqual(1, len(glob(path.join(cache_dir, '*.pickle'))))
+            with patch('codevo.codebase._parser') as parser:
+                self.assertEqual(classes, parse_initial_classes(java_file_name, cache_dir=cache_dir))
+                parser.parse_string.assert_not_called()
+            with open(java_file_name, 'w') as java_file:
+                java_file.write('public class Main { void run() {} }')
+            self.assertEqual('Main', parse_initial_classes(java_file_name, cache_dir=cache_dir)[0].name)
+            self.assertEqual(2, len(glob(path.join(cache_dir, '*.pickle'))))
+
+    def test_initial_classes_from_directory(self):
+        sources = {
+            'Base.java': 'public class Base { void log() {} void step() { log(); } }',
+            path.join('sub', 'Worker.java'):
+                'public class Worker extends Base { void step() { super.step(); if (true) { Helper.help(); } }'
+                ' void run() { int x = 0; step(); this.log(); } }',
+            path.join('sub', 'Helper.java'): 'public class Helper { static void help() { String s = "a";'
+                                             ' s.length(); } void run() {} }'
+        }
+        with TemporaryDirectory() as source_dir:
+            for name, source in sources.items():
+                makedirs(path.dirname(path.join(source_dir, name)), exist_ok=True)
+                with open(path.join(source_dir, name), 'w') as java_file:
+                    java_file.write(source)
+            codebase = Codebase(initial_classes=parse_initial_classes(source_dir, jobs=2, cache_dir=None))
+        self.assertEqual(['Base', 'Helper', 'Worker'], list(codebase._inheritance_graph))
+        self.assertEqual({'Base'}, {codebase._inheritance_graph.name_of(i) for i in codebase._inheritance_graph.successors(
+            codebase._inheritance_graph.id_of('Worker'))})
+        # duplicate names are made unique
+        self.assertEqual(['log', 'step', 'help', 'run', 'step_1', 'run_1'], list(codebase._method_call_graph))
+        self.assertEqual('Worker', codebase.get_class_name('step_1'))
+        self.assertEqual({'step', 'run_1'}, set(codebase.caller_names('log')))
+        self.assertEqual({'step_1'}, set(codebase.caller_names('step')))
+        self.assertEqual({'run_1'}, set(codebase.caller_names('step_1')))
+        self.assertEqual(['step_1'], [i.name for i in codebase.method_invocations('step_1')])
+        # calls nested in other statements are only in the call graph
+        self.assertEqual({'step_1'}, set(codebase.caller_names('help')))
+        self.assertEqual([], list(codebase.method_invocations('help')))
+        for class_name in codebase._inheritance_graph:
+            printer = JavaPrinter()
+            class_id = codebase._inheritance_graph.id_of(class_name)
+            codebase.class_declaration(class_name).accept(printer)
+            self.assertEqual(printer.lines, codebase._class_lines[class_id])
+        # call sites parsed from the initial classes keep their targets until moved
+        codebase.add_parameter('log')
+        codebase.move_method('step', 'Helper')
+        printer = JavaPrinter()
+        codebase.class_declaration('Worker').accept(printer)
+        self.assertIn('        Helper.step();\n', printer.result)
+        self.assertIn('        step_1();\n', printer.result)
+        self.assertIn('        this.log(x);\n', printer.result)
+
+    def test_associations_count_calls(self):
+        codebase = Codebase()
+        _, class_name = codebase.create_class(None)
+        _, method = codebase.create_method('App')
+        codebase.add_method_call('run', method)
+        codebase.add_method_call('run', method)
+        self.assertEqual(2, codebase.coupling('App', 'App'))
+        codebase.move_method(method, class_name)
+        self.assertEqual(0, codebase.coupling('App', 'App'))
+        self.assertEqual(2, codebase.coupling('App', class_name))
+        codebase.delete_method(method)
+        self.assertEqual(0, codebase.class_degree('App'))
+
+    def test_initial_class_with_control_flow(self):
+        source = (
+            'public class Counter {\n'
+            '    private int count = 0;\n'
+            '    public Counter(int start) {\n'
+            '        count = start;\n'
+            '    }\n'
+            '    public int run(int x) {\n'
+            '        int y = x * 2;\n'
+            '        if (check(x)) {\n'
+            '            helper(x);\n'
+            '        } else {\n'
+            '            y++;\n'
+            '        }\n'
+            '        for (int i = 0; i < y; i++) {\n'
+            '            count += i;\n'
+            '        }\n'
+            '        helper(y);\n'
+            '        return count;\n'
+            '    }\n'
+            '    boolean check(int x) {\n'
+            '        return x > 0;\n'
+            '    }\n'
+            '    void helper(int v) {\n'
+            '    }\n'
+            '}\n')
+        with TemporaryDirectory() as source_dir:
+            with open(path.join(source_dir, 'Counter.java'), 'w') as java_file:
+                java_file.write(source)
+            codebase = Codebase(initial_classes=parse_initial_classes(source_dir, cache_dir=None))
+        self.assertEqual(24, codebase._class_lines[codebase._inheritance_graph.id_of('Counter')])
+        self.assertEqual([13, 3, 2], [codebase._method_lines[i] for i in codebase._method_call_graph.ids()])
+        # statements the printer has no visitor for are printed as they were written
+        printer = JavaPrinter()
+        codebase.class_declaration('Counter').accept(printer)
+        self.assertEqual(source.rstrip('\n'), printer.result)
+        # nested calls follow their callee
+        codebase.add_parameter('helper')
+        codebase.rename_method('helper')
+        printer = JavaPrinter()
+        codebase.class_declaration('Counter').accept(printer)
+        self.assertIn('            method0(x, y);\n', printer.result)
+        self.assertIn('        method0(y, y);\n', printer.result)
+        self.assertIn('    void method0(int v, int param1) {\n', printer.result)
+        # but are not indexed, so their callees can't be deleted
+        self.assertFalse(codebase.is_deletable('check'))
+        self.assertRaises(ValueError, codebase.delete_method, 'check')
+        self.assertTrue(codebase.is_deletable('run'))
+
+    def test_calls_from_other_members(self):
+        source = (
+            'public class Counter {\n'
+            '    static {\n'
+            '        init();\n'
+            '    }\n'
+            '    private int count = compute(2);\n'
+            '    public Counter(int start) {\n'
+            '        helper(1);\n'
+            '    }\n'
+            '    class Inner {\n'
+            '        void go() {\n'
+            '            helper(4);\n'
+            '        }\n'
+            '    }\n'
+            '    static void init() {\n'
+            '    }\n'
+            '    int compute(int v) {\n'
+            '        return v;\n'
+            '    }\n'
+            '    void helper(int v) {\n'
+            '    }\n'
+            '    void run() {\n'
+            '    }\n'
+            '}')
+        with TemporaryDirectory() as source_dir:
+            with open(path.join(source_dir, 'Counter.java'), 'w') as java_file:
+                java_file.write(source)
+            codebase = Codebase(initial_classes=parse_initial_classes(source_dir, cache_dir=None))
+        # calls from members other than methods aren't in the call graph, but their callees stay
+        self.assertEqual([], list(codebase.caller_names('helper')))
+        self.assertEqual([False, False, False, True],
+                         [codebase.is_deletable(m) for m in ['init', 'compute', 'helper', 'run']])
+        codebase.add_parameter('helper')
+        codebase.rename_method('helper')
+        codebase.rename_method('init')
+        printer = JavaPrinter()
+        codebase.class_declaration('Counter').accept(printer)
+        self.assertIn('        method1();\n', printer.result)
+        self.assertIn('        method0(1, 0);\n', printer.result)
+        self.assertIn('            method0(4, 0);\n', printer.result)
+        self.assertNotIn('helper', printer.result)
+
+    def test_initial_class_headers(self):
+        sources = {
+            'Base.java': 'public class Base<T> {\n    void log() {\n    }\n}',
+            'Task.java': (
+                'public abstract class Task<T extends Comparable<T>> extends Base<T> implements Runnable {\n'
+                '    abstract void doIt();\n'
+                '    public <V> java.util.Map<String, V> get(final java.util.List<? extends T> xs, int[] ys)\n'
+                '            throws java.io.IOException {\n'
+                '        return null;\n'
+                '    }\n'
+                '}')
+        }
+        with TemporaryDirectory() as source_dir:
+            for name, source in sources.items():
+                with open(path.join(source_dir, name), 'w') as java_file:
+                    java_file.write(source)
+            codebase = Codebase(initial_classes=parse_initial_classes(source_dir, cache_dir=None))
+        for class_name in codebase._inheritance_graph:
+            printer = JavaPrinter()
+            codebase.class_declaration(class_name).accept(printer)
+            self.assertEqual(sources[class_name + '.java'], printer.result)
+        codebase.rename_method('get')
+        codebase.add_parameter('method0')
+        codebase.add_statement('doIt')
+        codebase.delete_method('log')
+        printer = JavaPrinter()
+        codebase.class_declaration('Task').accept(printer)
+        self.assertEqual('public abstract class Task<T extends Comparable<T>> implements Runnable {\n'
+                         '    void doIt() {\n'
+                         '        int var1 = 1;\n'
+                         '    }\n'
+                         '    public <V> java.util.Map<String, V> method0(final java.util.List<? extends T> xs, '
+                         'int[] ys, int param2)\n'
+                         '            throws java.io.IOException {\n'
+                         '        return null;\n'
+                         '    }\n'
+                         '}', printer.result)
+
+    def test_save_columnar(self):
+        codebase = Codebase()
+        _, class_name = codebase.create_class('App')
+        _, method1 = codebase.create_method(class_name)
+        _, method2 = codebase.create_method('App')
+        codebase.add_method_call(method1, method2)
+        codebase.add_method_call('run', method2)
+        codebase.add_method_call(method2, method2)
+        with TemporaryDirectory() as output_dir:
+            codebase.save(output_dir, False, 'both')
+            methods = load_table(output_dir, 'methods')
+            classes = load_table(output_dir, 'classes')
+            calls = load_table(output_dir, 'calls')
+            associations = load_table(output_dir, 'associations')
+            inheritance = load_table(output_dir, 'inheritance')
+            with open(path.join(output_dir, 'methods.csv')) as methods_file:
+                method_rows = list(csv.DictReader(methods_file))
+            with open(path.join(output_dir, 'classes.csv')) as classes_file:
+                class_rows = list(csv.DictReader(classes_file))
+            self.assertEqual([r['method'] for r in method_rows], methods['name'].tolist())
+            self.assertEqual([r['class'] for r in method_rows], classes['name'][methods['class']].tolist())
+            self.assertEqual([int(r['ref_count']) for r in method_rows], methods['ref_count'].tolist())
+            self.assertEqual([int(r['degree']) for r in class_rows], classes['degree'].tolist())
+            self.assertEqual([int(r['lines']) for r in class_rows], classes['lines'].tolist())
+            names = methods['name']
+            self.assertEqual({('run', method2), (method1, method2), (method2, method2)},
+                             set(zip(names[calls['caller']].tolist(), names[calls['callee']].tolist())))
+            self.assertEqual([(1, 0)], list(zip(inheritance['subclass'].tolist(), inheritance['superclass'].tolist())))
+            self.assertEqual([(0, 0, 2), (0, 1, 2)], list(zip(associations['source'].tolist(), associations['target'].tolist(),
+                                                              associations['weight'].tolist())))
+            del methods, classes, calls, associations, inheritance
@@ -0,0 +1,24 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from os import path
+import csv
+from codevo.commit_log import CommitLog, load_commits
+
+
+class CommitLogTest(TestCase):
+    def test_write_csv_and_binary(self):
+        with TemporaryDirectory() as output_dir:
+            commits = [(0.5, 3), (0.25, 1), (0.75, 10)]
+            with CommitLog(output_dir, write_binary=True, flush_interval=2) as commit_log:
+                for min_fitness, change_size in commits:
+                    commit_log.append(min_fitness, change_size)
+                # the first two commits are flushed already
+                loaded = load_commits(output_dir, mmap=False)
+                self.assertEqual([3, 1], list(loaded['change_size']))
+            self.assertEqual(3, commit_log.count)
+            with open(path.join(output_dir, 'commits.csv')) as commits_file:
+                rows = list(csv.DictReader(commits_file))
+            self.assertEqual(commits, [(float(r['min_fitness']), int(r['change_size'])) for r in rows])
+            loaded = load_commits(output_dir)
+            self.assertEqual([0.5, 0.25, 0.75], list(loaded['min_fitness']))
+            self.assertEqual([3, 1, 10], list(loaded['change_size']))
@@ -0,0 +1,62 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+import numpy as np
+from codevo.commit_log import CommitLog
+from codevo.commit_sizes import commit_sizes, change_sizes, read_commits, DRAW_BATCH
+
+
+def chunked(min_fitness, change_size, chunk_size):
+    return [(min_fitness[i:i + chunk_size], change_size[i:i + chunk_size])
+            for i in range(0, len(change_size), chunk_size)]
+
+
+def get_commit_sizes(min_fitness, change_size, f0, min_sizes=None):
+    """
+    Row by row, as in analysis.R
+    """
+    sizes = []
+    min_commit_size = next(min_sizes) if min_sizes else 0
+    size = 0
+    for fitness, change in zip(min_fitness, change_size):
+        size += change
+        if fitness >= f0 and size >= min_commit_size:
+            sizes.append(size)
+            if min_sizes:
+                min_commit_size = next(min_sizes)
+            size = 0
+    if size > 0:
+        sizes.append(size)
+    return sizes
+
+
+class CommitSizesTest(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.min_fitness = rng.random(5000)
+        self.change_size = rng.integers(0, 5, 5000)
+
+    def test_threshold(self):
+        expected = get_commit_sizes(self.min_fitness, self.change_size, 0.3)
+        for chunk_size in [5000, 77, 1]:
+            chunks = chunked(self.min_fitness, self.change_size, chunk_size)
+            self.assertEqual(expected, commit_sizes(chunks, 0.3).tolist())
+        self.assertEqual(expected + [0] if expected[-1] else expected,
+                         change_sizes(chunked(self.min_fitness, self.change_size, 100), 0.3).tolist())
+
+    def test_mean_min_size(self):
+        draws = np.random.default_rng(1).lognormal(2, 1, DRAW_BATCH * 3)
+        expected = get_commit_sizes(self.min_fitness, self.change_size, 0.3, iter(draws.tolist()))
+        self.assertGreater(len(draws), len(expected))
+        for chunk_size in [5000, 77]:
+            chunks = chunked(self.min_fitness, self.change_size, chunk_size)
+            self.assertEqual(expected, commit_sizes(chunks, 0.3, 2, np.random.default_rng(1)).tolist())
+        self.assertEqual(self.change_size.sum(), sum(expected))
+
+    def test_read_commits(self):
+        expected = commit_sizes([(self.min_fitness, self.change_size)], 0.3).tolist()
+        for write_csv, write_binary in [(False, True), (True, False)]:
+            with TemporaryDirectory() as output_dir:
+                with CommitLog(output_dir, write_csv, write_binary) as commit_log:
+                    for fitness, change in zip(self.min_fitness, self.change_size):
+                        commit_log.append(fitness, change)
+                self.assertEqual(expected, commit_sizes(read_commits(output_dir, 1000), 0.3).tolist())
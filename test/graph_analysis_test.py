@@ -0,0 +1,35 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from os import path
+from codevo.simulate import simulate
+from codevo.graph_analysis import analyze, exact_analyze
+
+
+class GraphAnalysisTest(TestCase):
+    def test_matches_exact(self):
+        with TemporaryDirectory() as output_dir:
+            simulate(output_dir, 5000, 2, graph_format='both')
+            exact = exact_analyze(path.join(output_dir, 'classes.json'))
+            for graph in [path.join(output_dir, 'classes.json'), output_dir]:
+                # as many sources as nodes measures every component exactly
+                result = analyze(graph, sources=exact['nodes'], jobs=1)
+                for key in ['nodes', 'average_degree', 'transitivity', 'average_clustering']:
+                    self.assertAlmostEqual(exact[key], result[key], msg=key)
+                self.assertEqual(exact['degree_cc'].keys(), result['degree_cc'].keys())
+                for degree, cc in exact['degree_cc'].items():
+                    self.assertAlmostEqual(cc, result['degree_cc'][degree])
+                self.assertEqual([p['size'] for p in exact['path_lengths']],
+                                 [p['size'] for p in result['path_lengths']])
+                for expected, actual in zip(exact['path_lengths'], result['path_lengths']):
+                    self.assertAlmostEqual(expected['mean'], actual['mean'])
+                    self.assertEqual(actual['low'], actual['high'])
+
+    def test_sampled_path_lengths(self):
+        with TemporaryDirectory() as output_dir:
+            simulate(output_dir, 5000, 2)
+            graph = path.join(output_dir, 'classes.json')
+            exact = exact_analyze(graph)['path_lengths'][0]
+            sampled = analyze(graph, sources=exact['size'] // 2, jobs=2, seed=1)['path_lengths'][0]
+            self.assertEqual(exact['size'] // 2, sampled['sources'])
+            self.assertLess(sampled['low'], sampled['high'])
+            self.assertAlmostEqual(exact['mean'], sampled['mean'], delta=3 * (sampled['high'] - sampled['low']))
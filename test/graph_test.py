@@ -0,0 +1,61 @@
+from unittest import TestCase
+from codevo.graph import IndexedDiGraph, AssociationGraph
+
+
+class IndexedDiGraphTest(TestCase):
+    def test_nodes_and_edges(self):
+        graph = IndexedDiGraph('size')
+        a = graph.add_node('a', size=1)
+        b = graph.add_node('b', size=2)
+        c = graph.add_node('c')
+        graph.add_edge(a, b)
+        graph.add_edge(a, b)
+        graph.add_edge(b, b)
+        graph.add_edge(c, b)
+        self.assertEqual(3, graph.number_of_edges())
+        self.assertEqual(3, graph.in_degree(b))
+        self.assertEqual([(0, 2), (3, 1)], graph.in_degrees.items())
+        graph.rename_node('b', 'bb')
+        self.assertEqual(b, graph.id_of('bb'))
+        self.assertNotIn('b', graph)
+        self.assertEqual({a, b, c}, graph.predecessors(b))
+        graph.remove_node('bb')
+        self.assertEqual(0, graph.number_of_edges())
+        self.assertEqual(0, graph.out_degree(a))
+        self.assertEqual([(0, 2)], graph.in_degrees.items())
+        d = graph.add_node('d', size=4)
+        self.assertEqual(b, d)
+        self.assertEqual([1, 4, None], graph.columns['size'])
+        self.assertEqual(['a', 'c', 'd'], list(graph))
+
+    def test_to_networkx(self):
+        graph = IndexedDiGraph('size')
+        a = graph.add_node('a', size=1)
+        b = graph.add_node('b', size=2)
+        graph.add_edge(a, b)
+        nx_graph = graph.to_networkx('size')
+        self.assertEqual([('a', 'b')], nx_graph.edges())
+        self.assertEqual(2, nx_graph.node['b']['size'])
+
+
+class AssociationGraphTest(TestCase):
+    def test_weights_and_degrees(self):
+        graph = AssociationGraph()
+        for node_id in range(3):
+            graph.add_node(node_id)
+        graph.add_edge(0, 1)
+        graph.add_edge(1, 0)
+        graph.add_edge(1, 1)
+        graph.add_edge(2, 1, 3)
+        self.assertEqual(2, graph.weight(0, 1))
+        self.assertEqual(4, graph.degree(1))
+        self.assertEqual([(1, 2), (4, 1)], graph.degrees.items())
+        graph.remove_edge(0, 1)
+        graph.remove_edge(1, 1)
+        self.assertEqual([(0, 1, 1), (1, 2, 3)], sorted(graph.edges()))
+        graph.remove_edge(1, 0)
+        graph.add_edge(1, 2, -3)
+        self.assertEqual(0, graph.number_of_edges())
+        self.assertEqual([(0, 3)], graph.degrees.items())
+        graph.remove_node(2)
+        self.assertEqual(2, len(graph))
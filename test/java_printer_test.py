@@ -1,3 +1,4 @@
+import io
 from unittest import TestCase
 from plyj.parser import Parser
 from codevo import JavaPrinter
@@ -63,4 +64,22 @@ public class Foo {
         System.out.println(3);
     }
 }
-        '''.strip(), printer.result)
\ No newline at end of file
+        '''.strip(), printer.result)
+
+    def test_print_to_stream(self):
+        parser = Parser()
+        tree = parser.parse_string('''public class Foo{
+                                        static void bar(String a, String b) { double d = Math.random(); }
+                                    }''')
+        out = io.StringIO()
+        printer = JavaPrinter(out)
+        tree.accept(printer)
+        self.assertEqual('''
+public class Foo {
+    static void bar(String a, String b) {
+        double d = Math.random();
+    }
+}
+        '''.strip(), out.getvalue())
+        self.assertEqual('', printer.result)
+        self.assertEqual(out.getvalue().count('\n') + 1, printer.lines)
@@ -0,0 +1,58 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from os import path
+import numpy as np
+from scipy.special import zeta
+from scipy.optimize import minimize_scalar
+from codevo.simulate import simulate_replicates
+from codevo.power_law import fit_power_law, sample_power_law, compare_alternatives, bootstrap_p, analyze, \
+    find_output_dirs, QUANTITIES
+
+
+class PowerLawTest(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        # a power law tail above 4, with other values below
+        self.data = np.concatenate([sample_power_law(4, 2.5, 3000, rng), rng.integers(1, 4, 1000)])
+
+    def test_fit(self):
+        fit = fit_power_law(self.data)
+        self.assertAlmostEqual(2.5, fit['alpha'], delta=0.1)
+        self.assertLessEqual(fit['xmin'], 10)
+        # the scan over xmin agrees with fitting each xmin on its own
+        values = np.unique(self.data)
+        expected = []
+        for xmin in values[:-1]:
+            tail = self.data[self.data >= xmin]
+            alpha = minimize_scalar(lambda a: len(tail) * np.log(zeta(a, xmin)) + a * np.log(tail).sum(),
+                                    bounds=(1.0001, 10), method='bounded', options={'xatol': 1e-10}).x
+            tail_values, counts = np.unique(tail, return_counts=True)
+            fit_cdf = 1 - zeta(alpha, tail_values + 1.0) / zeta(alpha, xmin)
+            expected.append((np.abs(np.cumsum(counts) / len(tail) - fit_cdf).max(), xmin, alpha))
+        ks, xmin, alpha = min(expected)
+        self.assertEqual(xmin, fit['xmin'])
+        self.assertAlmostEqual(alpha, fit['alpha'], places=5)
+        self.assertAlmostEqual(ks, fit['ks'], places=6)
+
+    def test_max_xmin_below_smallest_value(self):
+        fit = fit_power_law(np.arange(1, 50), max_xmin=0)
+        self.assertEqual(1, fit['xmin'])
+        self.assertEqual(49, fit['n_tail'])
+
+    def test_bootstrap_and_alternatives(self):
+        fit = fit_power_law(self.data)
+        p = bootstrap_p(self.data, fit, 20, seed=1)
+        self.assertGreater(p, 0.1)
+        self.assertEqual(p, bootstrap_p(self.data, fit, 20, seed=1))
+        self.assertGreater(compare_alternatives(self.data, fit)['exponential'][0], 0)
+
+    def test_analyze_replicates(self):
+        with TemporaryDirectory() as output_dir:
+            simulate_replicates(output_dir, 2, 2, 1, until=3000)
+            output_dirs = find_output_dirs([output_dir])
+            self.assertEqual([path.join(output_dir, 'replicate%d' % i) for i in range(2)], output_dirs)
+            rows = analyze(output_dirs, list(QUANTITIES) + ['commit_size'], samples=4, jobs=2, seed=1, f0=0.1)
+        self.assertEqual(8, len(rows))
+        for row in rows:
+            self.assertTrue(0 <= row['p'] <= 1)
+            self.assertGreater(row['alpha'], 1)
@@ -0,0 +1,33 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from os import path
+import csv
+# the Codebase class instrumented by the profiler
+from codevo.profiling import OperationProfiler, Codebase
+
+
+class OperationProfilerTest(TestCase):
+    def test_instrument(self):
+        codebase = Codebase()
+        _, class_name = codebase.create_class(None)
+        _, method_name = codebase.create_method(class_name)
+        profiler = OperationProfiler()
+        with profiler.instrument():
+            codebase.add_method_call('run', method_name)
+            codebase.add_method_call(method_name, method_name)
+            codebase.add_statement(method_name)
+            codebase.rename_method(method_name)
+        codebase.choose_random_method()
+        self.assertEqual(2, profiler.stats['add_method_call'].calls)
+        # callers of the callee before each call
+        self.assertEqual(1, profiler.stats['add_method_call'].total_size)
+        self.assertEqual(1, profiler.stats['add_statement'].max_size)
+        self.assertEqual(2, profiler.stats['rename_method'].max_size)
+        self.assertEqual(0, profiler.stats['choose_random_method'].calls)
+        self.assertFalse(hasattr(Codebase.add_method_call, '__wrapped__'))
+        with TemporaryDirectory() as output_dir:
+            profiler.save(path.join(output_dir, 'profile.csv'))
+            with open(path.join(output_dir, 'profile.csv')) as profile_file:
+                rows = {row['operation']: row for row in csv.DictReader(profile_file)}
+        self.assertEqual('1', rows['rename_method']['calls'])
+        self.assertIn('add_statement', profiler.format_table())
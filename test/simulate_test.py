@@ -0,0 +1,86 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from os import path
+import csv
+from codevo.simulate import simulate, simulate_replicates
+
+
+class SimulateTest(TestCase):
+    def test_replicates(self):
+        with TemporaryDirectory() as output_dir:
+            summaries = simulate_replicates(output_dir, 2, 2, 10, until=500)
+            self.assertEqual([10, 11], [s['seed'] for s in summaries])
+            for i in range(2):
+                self.assertTrue(path.exists(path.join(output_dir, 'replicate%d' % i, 'commits.csv')))
+            with open(path.join(output_dir, 'summary.csv')) as summary_file:
+                rows = list(csv.DictReader(summary_file))
+            self.assertEqual(['0', '1'], [row['replicate'] for row in rows])
+
+    def test_seed(self):
+        with TemporaryDirectory() as output_dir:
+            for name in ['a', 'b']:
+                simulate(path.join(output_dir, name), 1000, 5)
+            with open(path.join(output_dir, 'a', 'commits.csv')) as a, open(path.join(output_dir, 'b', 'commits.csv')) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_resume(self):
+        with TemporaryDirectory() as output_dir:
+            straight_dir = path.join(output_dir, 'straight')
+            checkpointed_dir = path.join(output_dir, 'checkpointed')
+            simulate(straight_dir, 3000, 3, commit_format='both')
+            simulate(checkpointed_dir, 1500, 3, commit_format='both', checkpoint_interval=700)
+            summary = simulate(checkpointed_dir, 3000, None, commit_format='both',
+                               resume=path.join(checkpointed_dir, 'checkpoint.pkl'))
+            self.assertEqual(3, summary['seed'])
+            for name in ['commits.csv', 'commits.change_size.bin', 'methods.csv', 'classes.csv']:
+                with open(path.join(straight_dir, name), 'rb') as expected, \
+                        open(path.join(checkpointed_dir, name), 'rb') as actual:
+                    self.assertEqual(expected.read(), actual.read(), name)
+
+    def test_snapshots(self):
+        with TemporaryDirectory() as output_dir:
+            straight_dir = path.join(output_dir, 'straight')
+            checkpointed_dir = path.join(output_dir, 'checkpointed')
+            summary = simulate(straight_dir, 1000, 3, snapshot_interval=200)
+            simulate(checkpointed_dir, 500, 3, snapshot_interval=200, checkpoint_interval=300)
+            simulate(checkpointed_dir, 1000, None, snapshot_interval=200,
+                     resume=path.join(checkpointed_dir, 'checkpoint.pkl'))
+            with open(path.join(straight_dir, 'snapshots.csv')) as snapshots_file:
+                snapshots = list(csv.DictReader(snapshots_file))
+            self.assertEqual(['0', '200', '400', '600', '800', '1000'], [s['time'] for s in snapshots])
+            self.assertEqual(str(summary['methods']), snapshots[-1]['methods'])
+            self.assertEqual(str(summary['commits']), snapshots[-1]['commits'])
+            with open(path.join(straight_dir, 'distributions.csv')) as distributions_file:
+                ref_counts = [r for r in csv.DictReader(distributions_file)
+                              if r['time'] == '1000' and r['distribution'] == 'ref_count']
+            self.assertEqual(summary['methods'], sum(int(r['count']) for r in ref_counts))
+            for name in ['snapshots.csv', 'distributions.csv']:
+                with open(path.join(straight_dir, name)) as expected, \
+                        open(path.join(checkpointed_dir, name)) as actual:
+                    self.assertEqual(expected.read(), actual.read(), name)
+
+    def test_events(self):
+        with TemporaryDirectory() as output_dir:
+            straight_dir = path.join(output_dir, 'straight')
+            checkpointed_dir = path.join(output_dir, 'checkpointed')
+            summary = simulate(straight_dir, 1000, 3, record_events=True, flush_interval=7)
+            simulate(checkpointed_dir, 500, 3, record_events=True, checkpoint_interval=300)
+            simulate(checkpointed_dir, 1000, None, record_events=True,
+                     resume=path.join(checkpointed_dir, 'checkpoint.pkl'))
+            with open(path.join(straight_dir, 'team.csv')) as team_file:
+                team = list(csv.DictReader(team_file))
+            self.assertEqual(0, float(team[0]['time']))
+            self.assertEqual(list(range(1, summary['developers'] + 1)), [int(row['developers']) for row in team])
+            with open(path.join(straight_dir, 'tasks.csv')) as tasks_file:
+                tasks = 0
+                for row in csv.DictReader(tasks_file):
+                    tasks += 1 if row['event'] == 'created' else -1
+                    self.assertEqual(tasks, int(row['tasks']))
+            with open(path.join(straight_dir, 'work.csv')) as work_file:
+                work = list(csv.DictReader(work_file))
+            self.assertEqual(summary['commits'], len(work))
+            self.assertLess(max(int(row['developer']) for row in work), summary['developers'])
+            for name in ['team.csv', 'tasks.csv', 'work.csv']:
+                with open(path.join(straight_dir, name)) as expected, \
+                        open(path.join(checkpointed_dir, name)) as actual:
+                    self.assertEqual(expected.read(), actual.read(), name)
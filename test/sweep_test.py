@@ -0,0 +1,32 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from os import path
+import csv
+import random
+from codevo.sweep import grid_design, random_design, sweep
+
+
+class SweepTest(TestCase):
+    def test_grid_design(self):
+        design = grid_design({'p_rename': [0.2, 0.4], 'max_tasks': [5, 10, 20]})
+        self.assertEqual(6, len(design))
+        self.assertIn({'p_rename': 0.4, 'max_tasks': 5}, design)
+
+    def test_random_design(self):
+        design = random_design({'p_rename': [0.2, 0.4], 'max_tasks': [5, 20]}, 10, random.Random(1))
+        self.assertEqual(10, len(design))
+        for point in design:
+            self.assertTrue(0.2 <= point['p_rename'] <= 0.4)
+            self.assertIsInstance(point['max_tasks'], int)
+
+    def test_sweep(self):
+        config = {'time': 300, 'replicates': 2, 'seed': 3,
+                  'parameters': {'p_rename': [0.2, 0.4]}}
+        with TemporaryDirectory() as output_dir:
+            sweep(config, output_dir, jobs=2)
+            with open(path.join(output_dir, 'results.csv')) as results_file:
+                rows = list(csv.DictReader(results_file))
+            self.assertEqual(4, len(rows))
+            self.assertEqual(['0.2', '0.2', '0.4', '0.4'], [row['p_rename'] for row in rows])
+            self.assertEqual(['3', '4', '5', '6'], [row['seed'] for row in rows])
+            self.assertTrue(path.exists(path.join(output_dir, 'run1', 'replicate1', 'commits.csv')))
@@ -0,0 +1,56 @@
+from unittest import TestCase
+from unittest.mock import Mock
+import random
+from scipy import stats
+from codevo.team import Memory
+
+
+class MemoryTest(TestCase):
+    def setUp(self):
+        self.env = Mock(now=0)
+        self.memory = Memory(self.env)
+
+    def test_occur_empty(self):
+        self.assertTrue(self.memory.is_empty())
+        self.assertIsNone(self.memory.occur())
+
+    def test_occur_follows_occurrences(self):
+        occurrences = {'a': 1, 'bb': 2, 'method10': 5, 'c': 12}
+        for item, count in occurrences.items():
+            for _ in range(count):
+                self.memory.add(item)
+        self.memory.add('deleted')
+        self.memory.delete('deleted')
+        self.memory.add('old')
+        self.memory.rename('old', 'new')
+        occurrences['new'] = 1
+        random.seed(42)
+        num_samples = 20000
+        observed = {item: 0 for item in occurrences}
+        for _ in range(num_samples):
+            observed[self.memory.occur()] += 1
+        total = sum(occurrences.values())
+        expected = [occurrences[item] / total * num_samples for item in occurrences]
+        _, p = stats.chisquare([observed[item] for item in occurrences], expected)
+        self.assertGreater(p, 0.001)
+
+    def test_last_time(self):
+        self.memory.add('a')
+        self.env.now = 5
+        self.memory.add('a')
+        self.assertEqual(5, self.memory.last_time('a'))
+        self.assertIsNone(self.memory.last_time('b'))
+
+    def test_forget(self):
+        memory = Memory(self.env, forget_threshold=0.5)
+        memory.add('old')
+        self.env.now = 10
+        memory.add('recent')
+        self.env.now = 30
+        # retention of 'old' is exp(-30/40) < 0.5, while 'recent' is exp(-20/40) > 0.5
+        memory.add('new')
+        self.assertFalse(memory.has('old'))
+        self.assertTrue(memory.has('recent'))
+        self.env.now = 100
+        self.assertIsNone(memory.occur())
+        self.assertTrue(memory.is_empty())
@@ -0,0 +1,122 @@
+from unittest import TestCase
+from unittest.mock import patch
+from collections import Counter
+import random
+from codevo import utils
+import pickle
+import gc
+import weakref
+from codevo.utils import WeightedSampler, IndexedHeap, RandomStreams, gc_paused
+
+
+class WeightedSamplerTest(TestCase):
+    def test_sample_follows_weights(self):
+        sampler = WeightedSampler()
+        weights = {'a': 1, 'b': 3, 'c': 6}
+        for item, weight in weights.items():
+            sampler.add(item, weight)
+        for u, expected in [(0, 'a'), (0.09, 'a'), (0.1, 'b'), (0.39, 'b'), (0.4, 'c'), (0.99, 'c')]:
+            with patch.object(utils, 'random', return_value=u):
+                self.assertEqual(expected, sampler.sample())
+
+    def test_updates(self):
+        sampler = WeightedSampler()
+        for i in range(20):
+            sampler.add(i, i + 1)
+        sampler.remove(3)
+        sampler.set(5, 100)
+        sampler.increase(7, 2)
+        sampler.rename(8, 'eight')
+        sampler.add('new', 4)
+        self.assertNotIn(3, sampler)
+        self.assertEqual(100, sampler.weight(5))
+        self.assertEqual(10, sampler.weight(7))
+        self.assertEqual(9, sampler.weight('eight'))
+        self.assertEqual(sum(range(1, 21)) - 4 - 6 + 100 + 2 + 4, sampler.total())
+        random.seed(1)
+        counts = Counter(sampler.sample() for _ in range(20000))
+        self.assertNotIn(3, counts)
+        self.assertNotIn(8, counts)
+        self.assertAlmostEqual(100 / sampler.total(), counts[5] / 20000, delta=0.02)
+
+    def test_rng(self):
+        sampler = WeightedSampler(RandomStreams(1).codebase)
+        sampler.add('a', 1)
+        sampler.add('b', 1)
+        other = WeightedSampler(RandomStreams(1).codebase)
+        other.add('a', 1)
+        other.add('b', 1)
+        self.assertEqual([sampler.sample() for _ in range(50)], [other.sample() for _ in range(50)])
+
+    def test_empty(self):
+        sampler = WeightedSampler()
+        self.assertIsNone(sampler.sample())
+        sampler.add('a', 1)
+        sampler.remove('a')
+        self.assertIsNone(sampler.sample())
+
+
+class IndexedHeapTest(TestCase):
+    def test_matches_sorted_keys(self):
+        rng = random.Random(7)
+        heap = IndexedHeap()
+        keys = {}
+        for i in range(200):
+            keys[i] = rng.random()
+            heap.push(i, keys[i])
+        for i in range(0, 200, 3):
+            keys[i] = rng.random()
+            heap.update(i, keys[i])
+        for i in range(1, 200, 5):
+            del keys[i]
+            heap.remove(i)
+        expected = sorted(keys, key=keys.get)
+        self.assertEqual(len(keys), len(heap))
+        self.assertEqual(keys[expected[0]], heap.min_key())
+        self.assertEqual(expected[:10], heap.smallest(10))
+        self.assertEqual(expected, heap.smallest(len(keys) + 5))
+
+
+class RandomStreamsTest(TestCase):
+    def test_reproducible(self):
+        streams1, streams2 = RandomStreams(3), RandomStreams(3)
+        for s1, s2 in [(streams1.manager, streams2.manager), (streams1.developer(), streams2.developer()),
+                       (streams1.developer(), streams2.developer())]:
+            self.assertEqual([s1.random() for _ in range(10)], [s2.random() for _ in range(10)])
+            self.assertEqual(s1.uniform_batch(10).tolist(), s2.uniform_batch(10).tolist())
+        self.assertEqual(3, streams1.seed)
+
+    def test_independent(self):
+        streams = RandomStreams(3)
+        draws = [tuple(stream.random() for _ in range(5))
+                 for stream in [streams.manager, streams.codebase, streams.developer(), streams.developer()]]
+        self.assertEqual(4, len(set(draws)))
+        self.assertIsNotNone(RandomStreams().seed)
+
+    def test_pickle(self):
+        streams = RandomStreams(3)
+        stream = streams.developer()
+        stream.random()
+        stream.uniform_batch(5)
+        copy = pickle.loads(pickle.dumps(streams))
+        stream_copy = pickle.loads(pickle.dumps(stream))
+        self.assertEqual(stream.random(), stream_copy.random())
+        self.assertEqual(stream.uniform_batch(5).tolist(), stream_copy.uniform_batch(5).tolist())
+        self.assertEqual(streams.developer().random(), copy.developer().random())
+
+
+class GcPausedTest(TestCase):
+    def test_cycles_stay_collectable(self):
+        class Node:
+            pass
+        node = Node()
+        node.self = node
+        ref = weakref.ref(node)
+        freeze_count = gc.get_freeze_count()
+        with gc_paused():
+            self.assertFalse(gc.isenabled())
+            del node
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(freeze_count, gc.get_freeze_count())
+        gc.collect()
+        self.assertIsNone(ref())